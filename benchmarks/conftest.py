@@ -0,0 +1,108 @@
+"""
+Benchmarks for the lookalike generators, name handling and API hot paths.
+
+    cd benchmarks && pip install -r requirements.txt
+    pytest                                    # generators and names only
+    pytest --bench-db local --bench-rows 1000,1000000
+
+--bench-db names a database in src/app/databases.ini. Its blacklist is seeded with
+rows whose original starts with "bench-" and those rows are deleted afterwards;
+use a scratch database, the resolvers act on everything in blacklist.
+"""
+import sys
+from pathlib import Path
+
+SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(SRC))
+
+import pytest
+from sqlalchemy import text
+from app.database import db_manager
+
+# The manager reads databases.ini relative to the working directory (src/ in the container)
+if not db_manager.databases:
+    db_manager.config_path = str(SRC / "app" / "databases.ini")
+    db_manager.load_config()
+
+SEED_PREFIX = "bench-"
+SEED_BRANDS = 50
+BRAND = "examplebrandnamewithmanychars"
+
+def pytest_addoption(parser):
+    group = parser.getgroup("dnsinabox benchmarks")
+    group.addoption("--bench-db", default=None,
+                    help="databases.ini key to seed for the endpoint benchmarks (skipped without it)")
+    group.addoption("--bench-rows", default="1000,100000",
+                    help="comma-separated blacklist sizes to seed")
+    group.addoption("--bench-brand-lengths", default="6,12,24",
+                    help="comma-separated brand name lengths for the generators")
+
+def _ints(value: str):
+    return [int(part) for part in value.split(",") if part.strip()]
+
+def pytest_generate_tests(metafunc):
+    if "rows" in metafunc.fixturenames:
+        metafunc.parametrize("rows", _ints(metafunc.config.getoption("--bench-rows")), scope="session")
+    if "brand_length" in metafunc.fixturenames:
+        metafunc.parametrize("brand_length", _ints(metafunc.config.getoption("--bench-brand-lengths")))
+
+@pytest.fixture
+def brand(brand_length):
+    return (BRAND * (brand_length // len(BRAND) + 1))[:brand_length]
+
+@pytest.fixture(scope="session")
+def bench_db(pytestconfig):
+    db_key = pytestconfig.getoption("--bench-db")
+    if db_key is None:
+        pytest.skip("endpoint benchmarks need --bench-db")
+    if db_key not in db_manager.databases:
+        pytest.fail(f"--bench-db {db_key} is not in {db_manager.config_path}")
+    from app.migrations import run_migrations
+    run_migrations(db_manager.get_engine(db_key))
+    return db_key
+
+def _clear_seed(engine):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM blacklist WHERE original LIKE :prefix"), {"prefix": f"{SEED_PREFIX}%"})
+
+@pytest.fixture(scope="session")
+def seeded_db(bench_db, rows):
+    """bench_db holding `rows` seeded entries (two in three blocked) spread over SEED_BRANDS originals."""
+    from app.bulk import copy_into_staging, merge_staging
+    engine = db_manager.get_engine(bench_db)
+    _clear_seed(engine)
+    with engine.begin() as conn:
+        copy_into_staging(conn, [
+            (f"{SEED_PREFIX}{i % SEED_BRANDS}.example.", f"v{i}.{SEED_PREFIX}{i % SEED_BRANDS}.example.", int(i % 3 != 0))
+            for i in range(rows)
+        ])
+        merge_staging(conn)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE blacklist"))
+    yield bench_db
+    _clear_seed(engine)
+
+@pytest.fixture
+def seeded_entry(rows):
+    """(original, malicious) of a row in the middle of the seeded set."""
+    i = rows // 2
+    return f"{SEED_PREFIX}{i % SEED_BRANDS}.example.", f"v{i}.{SEED_PREFIX}{i % SEED_BRANDS}.example."
+
+@pytest.fixture(scope="session")
+def client(seeded_db):
+    """The API router on its own app (no UI, auth or background tasks), bound to the seeded database."""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api import router
+    from app.database import get_async_session
+
+    async def seeded_session():
+        async for session in db_manager.get_async_session(seeded_db):
+            yield session
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_async_session] = seeded_session
+    # One client (and so one event loop) per seeded size: asyncpg connections belong to their loop
+    with TestClient(app) as test_client:
+        yield test_client
@@ -0,0 +1,25 @@
+def test_get_stats_blacklist(benchmark, client):
+    def call():
+        response = client.get("/blacklist/stats")
+        assert response.status_code == 200
+    benchmark(call)
+
+def test_get_all_blacklist(benchmark, client):
+    def call():
+        response = client.get("/blacklist", params={"offset": 0, "limit": 100})
+        assert response.status_code == 200
+    benchmark(call)
+
+def test_get_all_blacklist_by_original(benchmark, client, seeded_entry):
+    original, _ = seeded_entry
+    def call():
+        response = client.get("/blacklist", params={"original": original, "limit": 100})
+        assert response.status_code == 200
+    benchmark(call)
+
+def test_get_all_blacklist_by_malicious(benchmark, client, seeded_entry):
+    _, malicious = seeded_entry
+    def call():
+        response = client.get("/blacklist", params={"malicious": malicious})
+        assert response.status_code == 200 and len(response.json()) == 1
+    benchmark(call)
@@ -0,0 +1,17 @@
+from collections import deque
+from app.lookalike import generate_typos, generate_homographs, generate_ribbon_domains, generate_jaro_winkler
+
+def consume(iterator) -> None:
+    deque(iterator, maxlen=0)
+
+def test_generate_typos(benchmark, brand):
+    benchmark(lambda: consume(generate_typos(brand)))
+
+def test_generate_homographs(benchmark, brand):
+    benchmark(lambda: consume(generate_homographs(brand)))
+
+def test_generate_ribbon_domains(benchmark, brand):
+    benchmark(lambda: consume(generate_ribbon_domains(brand)))
+
+def test_generate_jaro_winkler(benchmark, brand):
+    benchmark(lambda: consume(generate_jaro_winkler(brand)))
@@ -0,0 +1,46 @@
+from itertools import chain, islice
+import pytest
+from app.api import normalize_domain
+from app.blocklist import BlocklistMirror
+from app.codec import canonical_name, canonical_names
+from app.lookalike import generate_typos, generate_homographs, generate_ribbon_domains
+from app.public_suffix import split_domain
+from app.rpz import render_owner
+
+# Names per generator in the sample
+SAMPLE = 4000
+
+@pytest.fixture
+def names(brand):
+    # Real lookalikes: ASCII typos, Unicode homographs and keyword ribbons, over multi-label suffixes (co.in)
+    return list(chain.from_iterable(
+        islice(generator(brand), SAMPLE)
+        for generator in (generate_typos, generate_homographs, generate_ribbon_domains)
+    ))
+
+def test_split_domain(benchmark, names):
+    # Replaced strip_tld; cleared each round so every name walks the suffix trie
+    benchmark.pedantic(lambda: [split_domain(name) for name in names],
+                       setup=split_domain.cache_clear, rounds=20)
+
+def test_split_domain_cached(benchmark, names):
+    benchmark(lambda: [split_domain(name) for name in names])
+
+def test_normalize_domain(benchmark, names):
+    benchmark.pedantic(lambda: [normalize_domain(name) for name in names],
+                       setup=canonical_name.cache_clear, rounds=20)
+
+def test_canonical_names_batch(benchmark, names):
+    benchmark.pedantic(lambda: canonical_names(names), setup=canonical_name.cache_clear, rounds=20)
+
+def test_blocklist_matches(benchmark, names):
+    # What /blacklist/check answers; every tenth sample name is a wildcard rule
+    owners = [render_owner(name) for name in names]
+    mirror = BlocklistMirror()
+    for owner in ["*.evil.com"] + [f"*.{owner}" for owner in owners[::10] if owner]:
+        mirror.members.add(owner.encode())
+        mirror.wildcards.add(owner[2:])
+    # A wildcard covers the names below its suffix but not the suffix itself, as in the RPZ zones
+    assert mirror.matches(["evil.com", "www.evil.com", "a.b.evil.com", "notevil.com"]) == [
+        None, "*.evil.com", "*.evil.com", None]
+    benchmark(mirror.matches, [f"www.{owner}" if owner else None for owner in owners])
@@ -14,14 +14,25 @@ con = assert(env:connect(database, username, password, hostname))
 -- Declare a counter for custom metric
 declareMetric('blacklist-db-hit', 'counter', 'Counts Blacklisted domain queries from dnsdist')
 
+-- The name itself plus every "*.<parent>" wildcard rule that would cover it
+function rule_names(domain)
+    local names = { string.format("'%s'", con:escape(domain)) }
+    local parent = domain:match("^[^.]+%.(.+)$")
+    while parent do
+        table.insert(names, string.format("'*.%s'", con:escape(parent)))
+        parent = parent:match("^[^.]+%.(.+)$")
+    end
+    return table.concat(names, ", ")
+end
+
 function dns_blacklist_check(dq)
     
-    local domain = dq.qname:toString()
-    local escaped_domain = con:escape(domain)
+    -- Stored names are lower-case; clients may randomize the query's case
+    local domain = dq.qname:toString():lower()
     
-    -- Check blacklist
+    -- Check blacklist (exact entries and wildcard rules)
     local cursor = assert(con:execute(
-        string.format("SELECT 1 FROM blacklist WHERE malicious = '%s' AND blocked = 1", escaped_domain)
+        string.format("SELECT 1 FROM blacklist WHERE malicious IN (%s) AND blocked = 1 LIMIT 1", rule_names(domain))
     ))
     
     local result = cursor:fetch()
@@ -23,12 +23,24 @@ function preresolve ( dq )
         return resolve_func(dq)
 end
 
+-- The name itself plus every "*.<parent>" wildcard rule that would cover it
+function rule_names( domain )
+        local names = { string.format("'%s'", con:escape( domain )) }
+        local parent = domain:match("^[^.]+%.(.+)$")
+        while parent do
+                table.insert(names, string.format("'*.%s'", con:escape( parent )))
+                parent = parent:match("^[^.]+%.(.+)$")
+        end
+        return table.concat(names, ", ")
+end
+
 function resolve_func( dq )
         pdnslog("Got question for "..dq.qname:toString().." from "..dq.remoteaddr:toString().." to "..dq.localaddr:toString())
 
-        domain = dq.qname:toString()
+        -- Stored names are lower-case; resolvers may randomize the query's case
+        domain = dq.qname:toString():lower()
         -- pdnslog(domain, pdns.loglevels.Info)
-        local sth = assert (con:execute( string.format("SELECT 1 FROM blacklist WHERE malicious = '%s'", con:escape( domain )) ) )
+        local sth = assert (con:execute( string.format("SELECT 1 FROM blacklist WHERE malicious IN (%s) AND blocked = 1 LIMIT 1", rule_names( domain )) ) )
         if sth:fetch() then 
                 blacklist_db_hit:inc()
                 pdnslog("- Dopping query as the domain may be considered a phishing attempt.")
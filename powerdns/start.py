@@ -18,9 +18,7 @@ args = [
     "--allow-from=0.0.0.0/0",
     # "--disable-packetcache=yes"
     "--dnssec=log-fail",
-    "--max-cache-ttl=15",
-    "--max-cache-bogus-ttl=15",
-    "--max-cache-ttl=15",
+    # No cache TTL caps: the manager purges changed names through the API
     "--lua-dns-script=/home/blacklist.lua",
 ]
 
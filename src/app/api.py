@@ -1,50 +1,121 @@
-from typing import List 
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Query
-from .database import get_session, Blacklist, ValidDomain, BlacklistUpdate, db_manager, get_session
-from .lookalike import worker
-from sqlmodel import Session, select
+import asyncio
+import json
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from .database import get_async_session, Blacklist, ValidDomain, BlacklistUpdate, BlacklistCheck, AnalysisJob, db_manager
+from .jobs import enqueue_job, list_jobs, cancel_job
+from .stats import aggregate_stats
+from .listing import SORT_COLUMNS, list_page
+from .dns_cache import cache_usage
+from .purge import cache_purge_queue
+from .unbound import unbound_sync
+from .bulk import copy_into_staging, merge_staging
+from .importer import Record, iter_records
+from .exporter import MEDIA_TYPES, export_stream
+from .blocklist import blocklist_mirror
+from .public_suffix import registrable_domain, registrable_domains
+from .codec import canonical_name, canonical_names
+from .rpz import render_owner
+from .journal import journal_position, compacted_past, read_changes
+from .notify import broker_for
+from .config import IMPORT_BATCH_SIZE, CHECK_MAX_NAMES, CHANGES_PAGE_LIMIT, CHANGES_COALESCE_WINDOW, CHANGES_KEEPALIVE
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 router = APIRouter()
 
 # Domain normalization helper
 def normalize_domain(domain: str) -> str:
-    if not domain:
-        return "."
-    domain = domain.strip().rstrip('.')  # Clean whitespace and existing dots
-    if not domain:
+    if not domain or not domain.strip().rstrip('.'):
         return "."
+    return canonical_name(domain)
+
+def blacklist_name(domain: str) -> str:
+    """Normalized name to blacklist; 400 for an invalid name or a bare public suffix."""
     try:
-        # Convert to ASCII/Punycode format
-        ascii_domain = domain.encode('idna').decode('ascii')
-    except Exception as e:
-        raise ValueError(f"Invalid domain format: {domain} ({str(e)})")
-    return ascii_domain + '.'  # Append trailing dot
+        name = normalize_domain(domain)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if registrable_domain(name) is None:
+        raise HTTPException(status_code=400, detail=f"Refusing to blacklist a public suffix: {name}")
+    return name
+
+def analysis_domain(domain: str) -> str:
+    """Normalized domain to analyse; 400 unless it has a registrable domain."""
+    try:
+        name = normalize_domain(domain)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if registrable_domain(name) is None:
+        raise HTTPException(status_code=400, detail=f"No registrable domain in: {name}")
+    return name
+
+def import_batch(db_key: str, records: List[Record], default_original: str, default_blocked: int) -> dict:
+    names, invalid = canonical_names([malicious for malicious, _, _ in records])
+    # A bare public suffix ("co.uk.", "*.com.") would block a whole registry
+    for index, registrable in enumerate(registrable_domains(name or "" for name in names)):
+        if names[index] is not None and registrable is None:
+            names[index] = None
+            invalid += 1
+    rows = [
+        (original or default_original, name, default_blocked if blocked is None else blocked)
+        for name, (_, original, blocked) in zip(names, records)
+        if name is not None
+    ]
+    with db_manager.get_engine(db_key).begin() as conn:
+        if rows:
+            copy_into_staging(conn, rows)
+            inserted = merge_staging(conn)
+        else:
+            inserted = 0
+    return {"received": len(records), "invalid": invalid, "inserted": inserted, "duplicates": len(rows) - inserted}
 
 # --- API Endpoints ---
 @router.get("/blacklist", response_model=List[Blacklist])
-def get_all_blacklist(session: Session = Depends(get_session), 
-                     offset: int = 0, 
-                     limit: int = Query(default=100, ge=1, le=100),
-                     original: str = None, 
-                     malicious: str = None):
+async def get_all_blacklist(session: AsyncSession = Depends(get_async_session),
+                            offset: int = 0,
+                            limit: int = Query(default=100, ge=1, le=100),
+                            original: str = None,
+                            malicious: str = None):
     query = select(Blacklist)
 
     if original:
         query = query.where(Blacklist.original == original)
     if malicious:
-        query = query.where(Blacklist.malicious == malicious)
+        try:
+            query = query.where(Blacklist.malicious == canonical_name(malicious))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-    blacklist_domains = session.exec(query.offset(offset).limit(limit)).all()
+    blacklist_domains = (await session.exec(query.offset(offset).limit(limit))).all()
     return blacklist_domains
 
+@router.get("/blacklist/page")
+async def get_blacklist_page(session: AsyncSession = Depends(get_async_session),
+                             offset: int = Query(default=0, ge=0),
+                             limit: int = Query(default=50, ge=1, le=500),
+                             sort: str = Query(default="id", pattern=f"^({'|'.join(SORT_COLUMNS)})$"),
+                             descending: bool = False,
+                             search: str = None,
+                             blocked: Optional[int] = Query(default=None, ge=0, le=1),
+                             original: str = None):
+    """A sorted, filtered page plus the total size of the result (`exact` is false when capped)."""
+    return await session.run_sync(
+        list_page, offset=offset, limit=limit, sort=sort, descending=descending,
+        search=search, blocked=blocked, original=original,
+    )
+
 @router.post("/blacklist", response_model=Blacklist)
-def create_blacklist(*, session: Session = Depends(get_session), blacklist: Blacklist):
+async def create_blacklist(*, session: AsyncSession = Depends(get_async_session), blacklist: Blacklist):
     try:
         # Normalize domains before saving
         normalized_original = normalize_domain(blacklist.original)
-        normalized_malicious = normalize_domain(blacklist.malicious)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    normalized_malicious = blacklist_name(blacklist.malicious)
 
     # Create validated object with normalized domains
     db_blacklist = Blacklist(
@@ -53,59 +124,261 @@ def create_blacklist(*, session: Session = Depends(get_session), blacklist: Blac
         blocked=blacklist.blocked
     )
     session.add(db_blacklist)
-    session.commit()
-    session.refresh(db_blacklist)
+    try:
+        await session.commit()
+    except IntegrityError:
+        await session.rollback()
+        raise HTTPException(status_code=409, detail=f"Domain already blacklisted: {db_blacklist.malicious}")
+    await session.refresh(db_blacklist)
     return db_blacklist
 
+@router.post("/blacklist/import")
+async def import_blacklist(request: Request,
+                           format: str = Query(default="ndjson", pattern="^(ndjson|csv|hosts)$"),
+                           original: str = "Imported",
+                           blocked: int = Query(default=1, ge=0, le=1)):
+    """
+    Streams an NDJSON, CSV or hosts-file upload into the blacklist, IMPORT_BATCH_SIZE names
+    at a time, and answers with one NDJSON progress line per batch.
+    """
+    db_key = db_manager.selected()
+
+    async def progress():
+        totals = {"batches": 0, "received": 0, "invalid": 0, "inserted": 0, "duplicates": 0}
+        batch: List[Record] = []
+
+        async def flush():
+            result = await run_in_threadpool(import_batch, db_key, batch, original, blocked)
+            totals["batches"] += 1
+            for key in ("received", "invalid", "inserted", "duplicates"):
+                totals[key] += result[key]
+            batch.clear()
+            return json.dumps({"batch": totals["batches"], **result}) + "\n"
+
+        async for record, unparseable in iter_records(request.stream(), format):
+            if unparseable:
+                totals["invalid"] += 1
+                continue
+            batch.append(record)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                yield await flush()
+        if batch:
+            yield await flush()
+        yield json.dumps({"done": True, **totals}) + "\n"
+
+    return StreamingResponse(progress(), media_type="application/x-ndjson")
+
+@router.get("/blacklist/export")
+def export_blacklist(format: str = Query(default="ndjson", pattern="^(ndjson|csv|binary)$"),
+                     after: int = Query(default=0, ge=0),
+                     limit: Optional[int] = Query(default=None, ge=1),
+                     blocked: Optional[int] = Query(default=None, ge=0, le=1),
+                     original: str = None,
+                     gzip: bool = False):
+    """Streams the blacklist from a server-side cursor; `after` is the last id already received."""
+    headers = {"Content-Encoding": "gzip"} if gzip else {}
+    return StreamingResponse(
+        export_stream(db_manager.selected(), format, after, limit, blocked, original, gzip),
+        media_type=MEDIA_TYPES[format],
+        headers=headers,
+    )
+
+def changes_page(conn, since: int, limit: int) -> dict:
+    if compacted_past(conn, since):
+        return {"since": since, "next": journal_position(conn), "reset": True, "changes": []}
+    changes = read_changes(conn, since, limit)
+    return {
+        "since": since,
+        "next": changes[-1][0] if changes else since,
+        "reset": False,
+        "changes": changes,
+    }
+
+@router.get("/blacklist/changes")
+async def get_blacklist_changes(session: AsyncSession = Depends(get_async_session),
+                                since: int = Query(default=0, ge=0),
+                                limit: int = Query(default=1000, ge=1, le=CHANGES_PAGE_LIMIT)):
+    """
+    Changes committed after seq `since`, as [seq, op, malicious, original, blocked] rows
+    (op is add, remove or toggle). Resume with `since=next`. When `reset` is true the
+    entries after `since` were compacted: reload from /blacklist/export, then resume from `next`.
+    """
+    return await session.run_sync(lambda sync_session: changes_page(sync_session.connection(), since, limit))
+
+def sse_event(event: str, event_id: int, data: dict) -> str:
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.get("/blacklist/changes/stream")
+async def stream_blacklist_changes(request: Request, since: Optional[int] = Query(default=None, ge=0)):
+    """
+    Server-Sent Events feed of /blacklist/changes, pushed as soon as Postgres notifies a commit.
+    Changes landing within CHANGES_COALESCE_WINDOW share one `changes` event; the event id is
+    the seq reached, so reconnecting clients resume through Last-Event-ID. Without `since`
+    the stream starts at the current position.
+    """
+    db_key = db_manager.selected()
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        since = int(last_event_id)
+    broker = broker_for(db_key)
+    subscription = broker.subscribe()
+
+    def read_page(conn, position: Optional[int]) -> dict:
+        if position is None:
+            return {"since": None, "next": journal_position(conn), "reset": False, "changes": []}
+        return changes_page(conn, position, CHANGES_PAGE_LIMIT)
+
+    async def read(position: Optional[int]) -> dict:
+        async with db_manager.get_async_engine(db_key).connect() as conn:
+            return await conn.run_sync(read_page, position)
+
+    async def events():
+        try:
+            position = since
+            while True:
+                # Drain everything committed after our position, one page per event
+                while True:
+                    page = await read(position)
+                    position = page["next"]
+                    if page["reset"]:
+                        yield sse_event("reset", position, {"next": position})
+                        break
+                    if not page["changes"]:
+                        break
+                    yield sse_event("changes", position, {"next": position, "changes": page["changes"]})
+                    if len(page["changes"]) < CHANGES_PAGE_LIMIT:
+                        break
+                if not await subscription.wait(CHANGES_KEEPALIVE):
+                    yield ": keepalive\n\n"
+                    continue
+                await asyncio.sleep(CHANGES_COALESCE_WINDOW)
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/blocklist/snapshot")
+def get_blocklist_snapshot(request: Request):
+    """Sorted, length-prefixed blocked names; unchanged snapshots answer 304 to If-None-Match."""
+    if not blocklist_mirror.loaded:
+        blocklist_mirror.refresh()
+    etag, snapshot = blocklist_mirror.snapshot()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot, media_type="application/octet-stream", headers=headers)
+
+@router.post("/blacklist/check")
+def check_blacklist(check: BlacklistCheck):
+    """
+    Which of the given names are blocked, answered from the in-process blocklist mirror
+    (the resolvers' database) without a query per name. Names are normalized as on insert;
+    `rules` maps names blocked by a wildcard entry to that entry and `registrable` maps
+    each blocked name to its registrable domain.
+    """
+    if len(check.names) > CHECK_MAX_NAMES:
+        raise HTTPException(status_code=413, detail=f"At most {CHECK_MAX_NAMES} names per request")
+    if not blocklist_mirror.loaded:
+        blocklist_mirror.refresh()
+    normalized, invalid = canonical_names(check.names)
+    owners = [render_owner(name) if name else None for name in normalized]
+    blocked, blocked_owners, rules = [], [], {}
+    for name, owner, rule in zip(check.names, owners, blocklist_mirror.matches(owners)):
+        if rule is None:
+            continue
+        blocked.append(name)
+        blocked_owners.append(owner)
+        if rule != owner:
+            rules[name] = rule
+    return {
+        "seq": blocklist_mirror.seq,
+        "checked": len(check.names),
+        "invalid": invalid,
+        "blocked": blocked,
+        "rules": rules,
+        "registrable": dict(zip(blocked, registrable_domains(blocked_owners))),
+    }
+
 @router.get("/blacklist/stats")
-def get_stats_blacklist(session: Session = Depends(get_session)):
-    all_original_domains = session.exec(select(Blacklist.original).distinct()).all()
-    
-    stats = {}
-    for original in all_original_domains:
-        count = session.exec(select(Blacklist).where(Blacklist.original == original)).all()
-        stats[original] = len(count)
+async def get_stats_blacklist(session: AsyncSession = Depends(get_async_session)):
+    return await session.run_sync(aggregate_stats)
+
+@router.get("/resolution-cache/stats")
+async def get_resolution_cache_stats(session: AsyncSession = Depends(get_async_session)):
+    # Lookups happen in the job workers, which record them on their jobs
+    return await session.run_sync(cache_usage)
 
-    return stats
+@router.get("/resolver-cache/purge-stats")
+def get_cache_purge_stats():
+    return cache_purge_queue.stats()
+
+@router.get("/resolver-cache/unbound-sync")
+def get_unbound_sync_stats():
+    return unbound_sync.stats()
+
+@router.get("/db/pool-stats")
+def get_pool_stats():
+    return db_manager.get_pool_metrics()
 
 @router.post("/blacklist/add-to-queue")
-def blacklist_queue(*, session: Session = Depends(get_session), valid_domain: ValidDomain, background_tasks: BackgroundTasks):
-    try:
-        # Normalize domain before queuing
-        valid_domain.domain = normalize_domain(valid_domain.domain)
-    except ValueError as e:
-        raise HTTPException(status_code=400, detail=str(e))
-    
-    background_tasks.add_task(worker, valid_domain, db_key=db_manager.current_db)
-    return {"status": "success", "domain": valid_domain.domain}
+async def blacklist_queue(*, session: AsyncSession = Depends(get_async_session), valid_domain: ValidDomain):
+    valid_domain.domain = analysis_domain(valid_domain.domain)
+
+    job = await session.run_sync(enqueue_job, valid_domain.domain)
+    return {"status": "success", "domain": valid_domain.domain, "job_id": job.id, "job_status": job.status}
+
+@router.get("/jobs", response_model=List[AnalysisJob])
+async def get_jobs(session: AsyncSession = Depends(get_async_session),
+                   status: str = None,
+                   offset: int = 0,
+                   limit: int = Query(default=100, ge=1, le=100)):
+    return await session.run_sync(list_jobs, status=status, offset=offset, limit=limit)
+
+@router.get("/jobs/{job_id}", response_model=AnalysisJob)
+async def get_job(*, session: AsyncSession = Depends(get_async_session), job_id: int):
+    job = await session.get(AnalysisJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/jobs/{job_id}/cancel", response_model=AnalysisJob)
+async def cancel_analysis_job(*, session: AsyncSession = Depends(get_async_session), job_id: int):
+    job = await session.get(AnalysisJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return await session.run_sync(cancel_job, job)
 
 @router.patch("/blacklist/{entry_id}", response_model=Blacklist)
-def update_blacklist(
+async def update_blacklist(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     entry_id: int,
     update_data: BlacklistUpdate
 ):
-    db_entry = session.get(Blacklist, entry_id)
+    db_entry = await session.get(Blacklist, entry_id)
     if not db_entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
     db_entry.blocked = update_data.blocked
     session.add(db_entry)
-    session.commit()
-    session.refresh(db_entry)
+    await session.commit()
+    await session.refresh(db_entry)
     return db_entry
 
 @router.delete("/blacklist/{entry_id}")
-def delete_blacklist(
+async def delete_blacklist(
     *,
-    session: Session = Depends(get_session),
+    session: AsyncSession = Depends(get_async_session),
     entry_id: int
 ):
-    db_entry = session.get(Blacklist, entry_id)
+    db_entry = await session.get(Blacklist, entry_id)
     if not db_entry:
         raise HTTPException(status_code=404, detail="Entry not found")
     
-    session.delete(db_entry)
-    session.commit()
+    await session.delete(db_entry)
+    await session.commit()
     return {"status": "success"}
\ No newline at end of file
@@ -1,7 +1,11 @@
 from typing import List 
-from fastapi import APIRouter, Depends, BackgroundTasks, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from .database import get_session, Blacklist, ValidDomain, BlacklistUpdate, db_manager, get_session
-from .lookalike import worker
+from .jobs import enqueue_job
+from .stats import aggregate_stats
+from .codec import canonical_name
+from .api import blacklist_name, analysis_domain
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session, select
 
 router = APIRouter()
@@ -18,34 +22,36 @@ def get_all_blacklist(session: Session = Depends(get_session),
     if original:
         query = query.where(Blacklist.original == original)
     if malicious:
-        query = query.where(Blacklist.malicious == malicious)
+        try:
+            query = query.where(Blacklist.malicious == canonical_name(malicious))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
     blacklist_domains = session.exec(query.offset(offset).limit(limit)).all()
     return blacklist_domains
 
 @router.post("/blacklist", response_model=Blacklist)
 def create_blacklist(*, session: Session = Depends(get_session), blacklist: Blacklist):
+    blacklist.malicious = blacklist_name(blacklist.malicious)
     db_blacklist = Blacklist.model_validate(blacklist)
     session.add(db_blacklist)
-    session.commit()
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        raise HTTPException(status_code=409, detail=f"Domain already blacklisted: {db_blacklist.malicious}")
     session.refresh(db_blacklist)
     return db_blacklist
 
 @router.get("/blacklist/stats")
 def get_stats_blacklist(session: Session = Depends(get_session)):
-    all_original_domains = session.exec(select(Blacklist.original).distinct()).all()
-    
-    stats = {}
-    for original in all_original_domains:
-        count = session.exec(select(Blacklist).where(Blacklist.original == original)).all()
-        stats[original] = len(count)
-
-    return stats
+    return aggregate_stats(session)
 
 @router.post("/blacklist/add-to-queue")
-def blacklist_queue(*, session: Session = Depends(get_session), valid_domain: ValidDomain, background_tasks: BackgroundTasks):
-    background_tasks.add_task(worker, valid_domain, db_key=db_manager.current_db)
-    return {"status": "success", "domain": valid_domain.domain}
+def blacklist_queue(*, session: Session = Depends(get_session), valid_domain: ValidDomain):
+    valid_domain.domain = analysis_domain(valid_domain.domain)
+    job = enqueue_job(session, valid_domain.domain)
+    return {"status": "success", "domain": valid_domain.domain, "job_id": job.id, "job_status": job.status}
 
 @router.patch("/blacklist/{entry_id}", response_model=Blacklist)
 def update_blacklist(
@@ -1,9 +1,13 @@
+import asyncio
 import bcrypt
 import os
 import secrets
+from functools import lru_cache
 from typing import Optional
 from fastapi import Request
-from .config import PASSWORD_FILE
+from .config import PASSWORD_FILE, RESOLVER_API_KEY, RESOLVER_PATHS
+from .database import selected_db
+from .sessions import SessionData, session_store
 from starlette.responses import RedirectResponse
 
 # --- Authentication ---
@@ -13,8 +17,9 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
 
+@lru_cache(maxsize=1)
 def init_admin_password():
-    """Initialize admin password if it doesn't exist"""
+    """Initialize admin password if it doesn't exist (read once per process; restart after changing it)"""
     if not os.path.exists(PASSWORD_FILE):
         # Create password file with default password
         hashed_pw = hash_password("admin_password")  # Change this in production
@@ -26,35 +31,54 @@ def init_admin_password():
         with open(PASSWORD_FILE, "r") as f:
             return f.read().strip()
 
-# In-memory session storage (for demonstration)
-# In production, use a proper session store like Redis
-user_sessions = {}
+async def check_admin_password(plain_password: str) -> bool:
+    """bcrypt is deliberately slow: verify in a thread so the event loop keeps serving"""
+    return await asyncio.to_thread(verify_password, plain_password, init_admin_password())
 
-def create_session(user_id: str) -> str:
+# Sessions live in the configured store (see sessions.py), so any worker can serve any user
+async def create_session(user_id: str) -> str:
     """Create a new session and return session ID"""
-    session_id = secrets.token_urlsafe(32)
-    user_sessions[session_id] = user_id
-    return session_id
+    return await session_store.create(user_id)
 
-def get_session_user(session_id: str) -> Optional[str]:
+async def get_login_session(request: Request) -> Optional[SessionData]:
+    session_id = request.cookies.get("session_id")
+    return await session_store.get(session_id) if session_id else None
+
+async def get_session_user(session_id: str) -> Optional[str]:
     """Get user ID from session ID"""
-    return user_sessions.get(session_id)
+    session = await session_store.get(session_id)
+    return session.user_id if session else None
 
-def delete_session(session_id: str):
+async def delete_session(session_id: str):
     """Delete session"""
-    if session_id in user_sessions:
-        del user_sessions[session_id]
+    await session_store.delete(session_id)
 
-def is_authenticated(request: Request) -> bool:
+async def is_authenticated(request: Request) -> bool:
     """Check if user is authenticated"""
-    session_id = request.cookies.get("session_id")
-    return session_id is not None and get_session_user(session_id) is not None
+    return await get_login_session(request) is not None
+
+def is_resolver(request: Request) -> bool:
+    """Resolvers authenticate to their endpoints with the shared X-API-Key instead of a session"""
+    return (
+        RESOLVER_API_KEY is not None
+        and request.url.path in RESOLVER_PATHS
+        and secrets.compare_digest(request.headers.get("x-api-key", ""), RESOLVER_API_KEY)
+    )
 
 async def auth_middleware(request: Request, call_next):
     if request.url.path in ['/login', '/logout'] or request.url.path.startswith('/_nicegui/'):
         return await call_next(request)
+
+    if is_resolver(request):
+        return await call_next(request)
     
-    if not is_authenticated(request):
+    session = await get_login_session(request)
+    if session is None:
         return RedirectResponse(url='/login', status_code=302)
-    
-    return await call_next(request)
\ No newline at end of file
+
+    # Requests work on the database this session selected
+    token = selected_db.set(session.db_key)
+    try:
+        return await call_next(request)
+    finally:
+        selected_db.reset(token)
\ No newline at end of file
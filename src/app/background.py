@@ -0,0 +1,20 @@
+import asyncio
+from typing import Callable, List, Tuple
+
+# --- Periodic Background Tasks ---
+# Blocking work runs in a thread so the event loop keeps serving requests.
+async def run_periodically(name: str, fn: Callable[[], object], interval: float):
+    while True:
+        try:
+            await asyncio.to_thread(fn)
+        except Exception as e:
+            print(f"Background task {name} failed: {e}")
+        await asyncio.sleep(interval)
+
+def start_periodic(jobs: List[Tuple[str, Callable[[], object], float]]) -> List[asyncio.Task]:
+    return [asyncio.create_task(run_periodically(name, fn, interval)) for name, fn, interval in jobs]
+
+async def stop_periodic(tasks: List[asyncio.Task]):
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
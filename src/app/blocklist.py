@@ -0,0 +1,267 @@
+import asyncio
+import hashlib
+import struct
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Set
+from sqlmodel import select
+from .config import SNAPSHOT_BLOCK_SIZE, RPZ_JOURNAL_BATCH, EXPORT_FETCH_SIZE, CHANGES_KEEPALIVE
+from .database import Blacklist, db_manager
+from .journal import journal_position, read_journal, blocked_among, compacted_past
+from .notify import broker_for
+from .codec import WILDCARD_PREFIX
+from .rpz import render_owner, resolver_db_key
+
+# Snapshot layout (big-endian):
+#   SNAPSHOT_MAGIC | version (u64, journal seq) | count (u32) | sha256 of body (32 bytes) | body
+#   body: every blocked name, sorted, as length (u8) + lower-case ASCII without trailing dot
+#   wildcard rules appear as "*.suffix" and cover every name below suffix
+SNAPSHOT_MAGIC = b"DIBS\x01"
+_HEADER = struct.Struct(">QI")
+
+# --- Sorted Name Blocks ---
+class SortedBlocks:
+    """
+    A sorted set of names kept as a list of small sorted blocks. Each block caches its
+    encoded bytes, so re-encoding after a change only touches the blocks that changed.
+    """
+
+    def __init__(self, block_size: int = SNAPSHOT_BLOCK_SIZE):
+        self.block_size = block_size
+        self.blocks: List[List[bytes]] = []
+        self.encoded: List[Optional[bytes]] = []
+        self.count = 0
+
+    def load(self, names: Iterable[bytes]):
+        ordered = sorted(set(names))
+        self.blocks = [ordered[i:i + self.block_size] for i in range(0, len(ordered), self.block_size)]
+        self.encoded = [None] * len(self.blocks)
+        self.count = len(ordered)
+
+    def _locate(self, name: bytes) -> int:
+        # First block whose last name is >= name (or the last block)
+        lo, hi = 0, len(self.blocks) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.blocks[mid][-1] < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def add(self, name: bytes) -> bool:
+        if not self.blocks:
+            self.blocks, self.encoded, self.count = [[name]], [None], 1
+            return True
+        index = self._locate(name)
+        block = self.blocks[index]
+        position = bisect_left(block, name)
+        if position < len(block) and block[position] == name:
+            return False
+        insort(block, name)
+        self.encoded[index] = None
+        self.count += 1
+        if len(block) > 2 * self.block_size:
+            half = len(block) // 2
+            self.blocks[index:index + 1] = [block[:half], block[half:]]
+            self.encoded[index:index + 1] = [None, None]
+        return True
+
+    def remove(self, name: bytes) -> bool:
+        if not self.blocks:
+            return False
+        index = self._locate(name)
+        block = self.blocks[index]
+        position = bisect_left(block, name)
+        if position == len(block) or block[position] != name:
+            return False
+        del block[position]
+        self.count -= 1
+        if block:
+            self.encoded[index] = None
+        else:
+            del self.blocks[index]
+            del self.encoded[index]
+        return True
+
+    def body(self) -> bytes:
+        for index, block in enumerate(self.blocks):
+            if self.encoded[index] is None:
+                self.encoded[index] = b"".join(bytes((len(name),)) + name for name in block)
+        return b"".join(self.encoded)
+
+# --- Wildcard Rules ---
+class SuffixTrie:
+    """
+    Wildcard rules ("*.evil.com") as a trie over reversed labels (com -> evil). A name
+    matches when one of its proper suffixes is a rule, found in one walk from the TLD.
+    """
+
+    # Marks a node that ends a rule; never a valid label
+    RULE = ""
+
+    def __init__(self):
+        self.root: Dict[str, dict] = {}
+        self.count = 0
+
+    def add(self, suffix: str) -> bool:
+        node = self.root
+        for label in reversed(suffix.split('.')):
+            node = node.setdefault(label, {})
+        if self.RULE in node:
+            return False
+        node[self.RULE] = {}
+        self.count += 1
+        return True
+
+    def remove(self, suffix: str) -> bool:
+        labels = suffix.split('.')[::-1]
+        path = [self.root]
+        for label in labels:
+            node = path[-1].get(label)
+            if node is None:
+                return False
+            path.append(node)
+        if self.RULE not in path[-1]:
+            return False
+        del path[-1][self.RULE]
+        self.count -= 1
+        # Prune the branch back to the first node still in use
+        for depth in range(len(labels) - 1, -1, -1):
+            if path[depth + 1]:
+                break
+            del path[depth][labels[depth]]
+        return True
+
+    def match(self, owner: str) -> Optional[str]:
+        """The wildcard rule covering `owner`, if any."""
+        labels = owner.split('.')
+        node = self.root
+        for depth in range(len(labels) - 1, 0, -1):
+            node = node.get(labels[depth])
+            if node is None:
+                return None
+            if self.RULE in node:
+                return WILDCARD_PREFIX + '.'.join(labels[depth:])
+        return None
+
+# --- Blocklist Mirror ---
+class BlocklistMirror:
+    """
+    In-process copy of the blocked = 1 set, loaded once and then kept current from
+    blacklist_journal. Publishes a versioned snapshot for the resolvers and answers
+    membership checks from a hash set sharing the snapshot's name objects, plus a
+    trie of the wildcard rules.
+    """
+
+    def __init__(self, db_key: Optional[str] = None):
+        self.db_key = db_key
+        self.names = SortedBlocks()
+        self.members: Set[bytes] = set()
+        self.wildcards = SuffixTrie()
+        self.seq: Optional[int] = None
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._snapshot: Optional[bytes] = None
+        self._etag: Optional[str] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.seq is not None
+
+    def _engine(self):
+        return db_manager.get_engine(self.db_key or resolver_db_key())
+
+    def refresh(self) -> bool:
+        """Loads or catches up with the journal; returns True when the set changed."""
+        with self._refresh_lock:
+            return self._refresh()
+
+    async def follow(self):
+        """Catches up as soon as the database notifies a change, instead of waiting for the next poll."""
+        broker = broker_for(self.db_key or resolver_db_key())
+        subscription = broker.subscribe()
+        try:
+            while True:
+                if await subscription.wait(CHANGES_KEEPALIVE):
+                    try:
+                        await asyncio.to_thread(self.refresh)
+                    except Exception as e:
+                        print(f"Blocklist refresh failed: {e}")
+        finally:
+            broker.unsubscribe(subscription)
+
+    def _refresh(self) -> bool:
+        with self._engine().connect() as conn:
+            # A journal compacted past our position cannot be replayed: load from scratch
+            if not self.loaded or compacted_past(conn, self.seq):
+                seq = journal_position(conn)
+                result = conn.execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE).execute(
+                    select(Blacklist.malicious).where(Blacklist.blocked == 1)
+                )
+                owners = [owner.encode() for owner in map(render_owner, result.scalars()) if owner]
+                wildcards = SuffixTrie()
+                for owner in owners:
+                    if owner.startswith(WILDCARD_PREFIX.encode()):
+                        wildcards.add(owner[len(WILDCARD_PREFIX):].decode())
+                with self._lock:
+                    self.names.load(owners)
+                    self.members = set(owners)
+                    self.wildcards = wildcards
+                    self.seq = seq
+                    self._snapshot = None
+                return True
+
+            changed = False
+            while True:
+                seq, names = read_journal(conn, self.seq, RPZ_JOURNAL_BATCH)
+                if not names:
+                    break
+                blocked = {owner for owner in map(render_owner, blocked_among(conn, names)) if owner}
+                with self._lock:
+                    for owner in filter(None, map(render_owner, names)):
+                        name = owner.encode()
+                        wildcard = owner.startswith(WILDCARD_PREFIX)
+                        if owner in blocked:
+                            changed |= self.names.add(name)
+                            self.members.add(name)
+                            if wildcard:
+                                self.wildcards.add(owner[len(WILDCARD_PREFIX):])
+                        else:
+                            changed |= self.names.remove(name)
+                            self.members.discard(name)
+                            if wildcard:
+                                self.wildcards.remove(owner[len(WILDCARD_PREFIX):])
+                    self.seq = seq
+                    if changed:
+                        self._snapshot = None
+            return changed
+
+    def matches(self, owners: Iterable[Optional[str]]) -> List[Optional[str]]:
+        """
+        For each owner name (as from render_owner): the entry blocking it - the name
+        itself, or the wildcard rule covering it - or None.
+        """
+        members, wildcards = self.members, self.wildcards
+        results = []
+        for owner in owners:
+            if owner is None:
+                results.append(None)
+            elif owner.encode() in members:
+                results.append(owner)
+            else:
+                results.append(wildcards.match(owner) if wildcards.count else None)
+        return results
+
+    def snapshot(self):
+        """(etag, bytes) of the current snapshot, re-encoding only the blocks that changed."""
+        with self._lock:
+            if self._snapshot is None:
+                body = self.names.body()
+                digest = hashlib.sha256(body).digest()
+                self._snapshot = SNAPSHOT_MAGIC + _HEADER.pack(self.seq or 0, self.names.count) + digest + body
+                self._etag = f'"{digest.hex()}"'
+            return self._etag, self._snapshot
+
+# Shared by the API and the background refresher in this process
+blocklist_mirror = BlocklistMirror()
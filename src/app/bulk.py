@@ -0,0 +1,82 @@
+import csv
+import io
+from typing import List, Sequence, Tuple
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection
+from .config import BULK_BATCH_SIZE, BULK_COPY_THRESHOLD
+from .database import Blacklist
+
+# (original, malicious, blocked)
+Row = Tuple[str, str, int]
+
+# --- Bulk Blacklist Writes ---
+def copy_into_staging(conn: Connection, rows: Sequence[Row], table: str = "blacklist_staging"):
+    """COPYs rows into a temporary staging table that is dropped at commit."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {table} "
+            "(original TEXT, malicious TEXT, blocked INTEGER) ON COMMIT DROP"
+        )
+        cursor.copy_expert(f"COPY {table} (original, malicious, blocked) FROM STDIN WITH (FORMAT csv)", buffer)
+    finally:
+        cursor.close()
+
+def merge_staging(conn: Connection, table: str = "blacklist_staging") -> int:
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(
+            f"INSERT INTO blacklist (original, malicious, blocked) "
+            f"SELECT original, malicious, blocked FROM {table} ON CONFLICT DO NOTHING"
+        )
+        inserted = cursor.rowcount
+        cursor.execute(f"TRUNCATE {table}")
+        return inserted
+    finally:
+        cursor.close()
+
+def insert_rows(conn: Connection, rows: Sequence[Row]) -> int:
+    """Inserts rows, skipping names already blacklisted, and returns how many were new."""
+    if not rows:
+        return 0
+    if len(rows) >= BULK_COPY_THRESHOLD:
+        copy_into_staging(conn, rows)
+        return merge_staging(conn)
+    stmt = insert(Blacklist).values([
+        {"original": original, "malicious": malicious, "blocked": blocked}
+        for original, malicious, blocked in rows
+    ]).on_conflict_do_nothing()
+    return conn.execute(stmt).rowcount
+
+class BlacklistWriter:
+    """Buffers confirmed lookalikes and writes them in a few multi-row statements."""
+
+    def __init__(self, engine, batch_size: int = BULK_BATCH_SIZE):
+        self.engine = engine
+        self.batch_size = batch_size
+        self.rows: List[Row] = []
+        self.inserted = 0
+
+    def add(self, original: str, malicious: str, blocked: int = 1):
+        self.rows.append((original, malicious, blocked))
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        rows, self.rows = self.rows, []
+        if not rows:
+            return 0
+        with self.engine.begin() as conn:
+            inserted = insert_rows(conn, rows)
+        self.inserted += inserted
+        return inserted
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
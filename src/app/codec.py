@@ -0,0 +1,99 @@
+import re
+import unicodedata
+from encodings.idna import ToASCII, ToUnicode
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from .config import CODEC_CACHE_SIZE
+
+# Canonical form of every stored name: lower-case ASCII, IDN labels in Punycode, a trailing
+# dot, and optionally the "*." wildcard prefix - what resolvers see on the wire.
+MAX_NAME_LENGTH = 254
+MAX_LABEL_LENGTH = 63
+
+# Stored names starting with this block every name below the rest ("*.evil.com." covers
+# "a.evil.com." and "x.y.evil.com.", but not "evil.com." itself)
+WILDCARD_PREFIX = "*."
+
+# Letters, digits, hyphen and underscore, no hyphen at either end: safe to write into zone
+# files, resolver configs and SQL literals as is
+LABEL = re.compile(rf"[a-z0-9_](?:[a-z0-9_-]{{0,{MAX_LABEL_LENGTH - 2}}}[a-z0-9_])?")
+
+# Presentation-format escapes: "\DDD" is one byte in decimal, "\X" is X itself
+_ESCAPE = re.compile(r"\\(\d{3}|.)", re.DOTALL)
+# Names already in canonical form, as nearly all bulk input is
+_CANONICAL = re.compile(rf"(?:\*\.)?(?:{LABEL.pattern}\.)*{LABEL.pattern}\.?")
+
+# --- Single Names ---
+def unescape(name: str) -> str:
+    """Decodes presentation-format escapes ("ado\\225\\184\\133e.com" -> "adoḅe.com")."""
+    if '\\' not in name:
+        return name
+    raw, position = bytearray(), 0
+    for match in _ESCAPE.finditer(name):
+        raw += name[position:match.start()].encode()
+        token = match.group(1)
+        raw += bytes((int(token),)) if len(token) == 3 else token.encode()
+        position = match.end()
+    raw += name[position:].encode()
+    return raw.decode('utf-8')
+
+def _canonical_label(label: str, name: str) -> str:
+    if label.isascii():
+        encoded = label.lower()
+    else:
+        try:
+            encoded = ToASCII(label).decode('ascii').lower()
+        except UnicodeError as e:
+            raise ValueError(f"Invalid domain format: {name} ({e})")
+        # IDNA maps some characters onto others ("ſ" -> "s"); such a label would name a different domain
+        if ToUnicode(encoded) != unicodedata.normalize('NFC', label.lower()):
+            raise ValueError(f"Invalid domain format: {name} ({label!r} does not survive IDNA)")
+    # Punycode keeps the ASCII characters of a label, so check what was produced
+    if not LABEL.fullmatch(encoded):
+        raise ValueError(f"Invalid domain format: {name} (bad label {label!r})")
+    return encoded
+
+@lru_cache(maxsize=CODEC_CACHE_SIZE)
+def canonical_name(name: str) -> str:
+    """
+    Any spelling of a name - Unicode, Punycode, "\\DDD"-escaped, any case, with or without the
+    trailing dot - to its canonical form. Raises ValueError for anything that is not a name.
+    """
+    try:
+        domain = unescape(name.strip()).rstrip('.')
+    except ValueError as e:
+        raise ValueError(f"Invalid domain format: {name} ({e})")
+    prefix = ''
+    if domain.startswith(WILDCARD_PREFIX):
+        prefix, domain = WILDCARD_PREFIX, domain[len(WILDCARD_PREFIX):]
+    if not domain:
+        raise ValueError(f"Invalid domain format: {name!r} (empty)")
+    canonical = prefix + '.'.join(_canonical_label(label, name) for label in domain.split('.')) + '.'
+    if len(canonical) > MAX_NAME_LENGTH:
+        raise ValueError(f"Invalid domain format: {name} (longer than {MAX_NAME_LENGTH - 1} characters)")
+    return canonical
+
+# --- Batches ---
+def canonical_names(names: Iterable[str]) -> Tuple[List[Optional[str]], int]:
+    """
+    canonical_name for a batch: invalid names come back as None and are counted. Names
+    already canonical skip the conversion (and the shared LRU); repeats are converted once.
+    """
+    canonical, invalid = [], 0
+    seen: Dict[str, Optional[str]] = {}
+    fast = _CANONICAL.fullmatch
+    for name in names:
+        value = seen.get(name, seen)
+        if value is seen:
+            if name and fast(name) and len(name) < MAX_NAME_LENGTH:
+                value = name if name.endswith('.') else name + '.'
+            else:
+                try:
+                    value = canonical_name(name) if name else None
+                except ValueError:
+                    value = None
+            seen[name] = value
+        if value is None:
+            invalid += 1
+        canonical.append(value)
+    return canonical, invalid
@@ -1,3 +1,5 @@
+import os
+
 PASSWORD_FILE = "admin_password.txt"
 KEYWORDS = ["login", "account", "alert", "bank", "bill", "customer", "dashboard",
             "delivery", "help", "invoice", "logon", "noreply", "password", "portal", "security",
@@ -32,4 +34,173 @@ SIMILAR_CHARS = {
     'x': ['ẋ', 'ẍ', 'ӽ'],
     'y': ['ý', 'ỳ', 'ŷ', 'ÿ', 'ɏ'],
     'z': ['ẓ', 'ž', 'ƶ', 'ẑ']
-}
\ No newline at end of file
+}
+
+# --- DNS Verification ---
+GOOGLE_DNS_SERVER = '8.8.8.8'
+QUAD9_DNS_SERVER = '9.9.9.9'
+DNS_TIMEOUT = 5.0
+# Maximum number of candidates being resolved at the same time
+DNS_CONCURRENCY = 200
+
+# --- Resolution Cache ---
+# Entries kept in the in-process LRU in front of the resolution_cache table
+DNS_CACHE_SIZE = 100_000
+# Used when an NXDOMAIN/NODATA answer carries no SOA record
+DNS_CACHE_NEGATIVE_TTL = 3600
+DNS_CACHE_MIN_TTL = 60
+DNS_CACHE_MAX_TTL = 86400
+# Candidates looked up in the table (and written back) per round-trip
+DNS_CACHE_CHUNK = 1000
+
+# --- Analysis Jobs ---
+# Candidates verified between two checkpoints of a job
+JOB_CHECKPOINT_EVERY = 2000
+# A running job whose checkpoint is older than this is considered orphaned and re-claimed
+JOB_STALE_AFTER = 600
+JOB_POLL_INTERVAL = 2.0
+JOB_WORKER_PROCESSES = 2
+
+# --- Candidate Generation ---
+# Processes used to generate and score candidates; 0 or 1 generates in the calling process
+GENERATION_PROCESSES = 0
+# Character positions of the brand name covered by one shard
+GENERATION_SHARD_SIZE = 4
+
+# --- Stats ---
+# Read per-original counts from the trigger-maintained blacklist_stats table
+# instead of aggregating the blacklist table on every request
+STATS_COUNTER_TABLE = True
+
+# --- Bulk Writes ---
+# Rows buffered before a flush
+BULK_BATCH_SIZE = 5000
+# Batches at least this large are loaded with COPY instead of a multi-row INSERT
+BULK_COPY_THRESHOLD = 1000
+# Names normalized and COPYed per batch by the streaming import endpoint
+IMPORT_BATCH_SIZE = 10_000
+# Rows fetched per server-side cursor round-trip by the export endpoint
+EXPORT_FETCH_SIZE = 2000
+
+# --- Unbound Remote Control ---
+UNBOUND_CONTROL_SOCKET = "/var/run/unbound/unbound.ctl"
+# Lines per local_datas / local_datas_remove command
+UNBOUND_SYNC_BATCH = 5000
+# How often an idle sync checks whether Unbound restarted (and so needs a full resync)
+UNBOUND_SYNC_CHECK_INTERVAL = 30.0
+
+# --- Resolver Zone Compiler ---
+# Database the resolvers read from; None means the first one in databases.ini
+RESOLVER_DB_KEY = None
+# `directory` is where the manager writes (see docker-compose volumes),
+# `include_dir` is where the resolver sees the shard files.
+RPZ_TARGETS = {
+    "knot": {
+        "directory": "/srv/resolvers/knot",
+        "filename": "blocklist.rpz",
+        "include_dir": "/etc/knot-resolver/rpz/shards",
+    },
+    "bind9": {
+        "directory": "/srv/resolvers/bind9",
+        "filename": "db.rpz.local",
+        "include_dir": "/etc/bind/rpz/shards",
+        # BIND only reads a primary zone again when told to; the key is generated by the
+        # bind9 container on first start and shared through the bind-rndc volume
+        "reload": ["rndc", "-s", "10.20.0.15", "-k", "/var/run/bind-rndc/rndc.key", "reload", "rpz.local"],
+    },
+    "unbound": {
+        "directory": "/srv/resolvers/unbound",
+        "filename": "blocked-domains.rpz",
+        "include_dir": "/var/unbound/etc/blocklist/shards",
+        # Loaded by unbound.conf's rpz: clause, which only reads the file when told to
+        "control_socket": UNBOUND_CONTROL_SOCKET,
+        "zone": "rpz.local",
+    },
+}
+# Each zone is split into this many include files; a change only rewrites its shard
+RPZ_SHARDS = 64
+RPZ_TTL = 300
+# Seconds a target's reload command may take
+RPZ_RELOAD_TIMEOUT = 10
+# Seconds between incremental builds
+RPZ_INTERVAL = 10
+# Journal entries applied per incremental step
+RPZ_JOURNAL_BATCH = 50_000
+
+# --- Blocklist Snapshot ---
+# Seconds between journal catch-ups of the in-memory blocklist
+SNAPSHOT_INTERVAL = 3
+# Names per encoded block of the snapshot
+SNAPSHOT_BLOCK_SIZE = 2048
+
+# --- Resolver Access ---
+# Shared key resolvers (and other machine clients) send as X-API-Key to the endpoints below;
+# unset disables key access
+RESOLVER_API_KEY = os.getenv("RESOLVER_API_KEY")
+RESOLVER_PATHS = {"/blocklist/snapshot", "/blacklist/check"}
+
+# --- Change Log ---
+# Journal entries older than this may be compacted once every consumer has applied them
+JOURNAL_RETENTION = 7 * 24 * 3600
+JOURNAL_COMPACT_INTERVAL = 3600
+# Most changes returned by one GET /blacklist/changes call
+CHANGES_PAGE_LIMIT = 10_000
+
+# --- Change Notifications ---
+# Changes arriving within this window are sent as one frame
+CHANGES_COALESCE_WINDOW = 0.05
+# Idle SSE streams send a comment this often so proxies keep them open
+CHANGES_KEEPALIVE = 15.0
+# Pause before re-opening a dropped LISTEN connection
+LISTEN_RECONNECT_DELAY = 2.0
+# The UI table re-renders at most this often while changes stream in
+UI_REFRESH_INTERVAL = 1.0
+
+# --- Membership Check ---
+# Most names accepted by one POST /blacklist/check
+CHECK_MAX_NAMES = 100_000
+
+# --- Blacklist Listing ---
+UI_PAGE_SIZE = 50
+# Searches count matches up to this many; the total beyond it is shown as "10,000+"
+LISTING_COUNT_CAP = 10_000
+
+# --- Sessions ---
+# "postgres" shares sessions between workers and hosts; "memory" keeps them in this process
+SESSION_STORE = os.getenv("SESSION_STORE", "postgres")
+# Database holding user_sessions; None means the first configured one
+SESSION_DB_KEY = None
+SESSION_TTL = 3600
+# A session looked up within this many seconds is answered from the process cache, so a
+# logout on another worker takes up to this long to be seen here
+SESSION_CACHE_TTL = 30
+# Most sessions cached per process
+SESSION_CACHE_SIZE = 10_000
+SESSION_SWEEP_INTERVAL = 300
+
+# --- Resolver Cache Purging ---
+# Resolvers whose caches are purged of changed names; a target without credentials or
+# without its control socket mounted is skipped
+PURGE_TARGETS = {
+    "powerdns": {"kind": "powerdns", "url": "http://powerdns:8082", "api_key": os.getenv("PDNS_API_KEY")},
+    "dnsdist": {"kind": "dnsdist", "host": "10.20.0.16", "port": 5199, "key": os.getenv("DNSDIST_CONSOLE_KEY")},
+    "unbound": {"kind": "unbound", "socket": UNBOUND_CONTROL_SOCKET},
+    "knot": {"kind": "kresd", "socket": "/var/run/kresd-control/control.sock"},
+}
+# Changed names are collected for this long and purged together
+PURGE_INTERVAL = 0.5
+# Most names per purge batch
+PURGE_BATCH = 500
+PURGE_TIMEOUT = 5.0
+
+# --- Public Suffix List ---
+# Bundled snapshot of https://publicsuffix.org/list/public_suffix_list.dat
+PUBLIC_SUFFIX_LIST = os.path.join(os.path.dirname(__file__), "data", "public_suffix_list.dat")
+# Also treat the PRIVATE section (github.io, blogspot.com, ...) as suffixes
+PUBLIC_SUFFIX_PRIVATE = False
+# Names whose split is memoized
+PUBLIC_SUFFIX_CACHE_SIZE = 100_000
+
+# --- Canonical Names ---
+# Distinct names whose canonical form is memoized
+CODEC_CACHE_SIZE = 100_000
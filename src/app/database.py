@@ -1,9 +1,19 @@
 import configparser
+import os
+from contextvars import ContextVar
+import time
+from datetime import datetime
 from pathlib import Path
-from typing import Dict, Generator, Optional
+from typing import AsyncGenerator, Dict, Generator, List, Optional
+from sqlalchemy import BigInteger, Column, DateTime, Index, event, func, text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import create_engine, Session, SQLModel, Field, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from .config import PASSWORD_FILE
 import threading
+# Database chosen by the session handling the current request (set by the auth middleware)
+selected_db: ContextVar[Optional[str]] = ContextVar("selected_db", default=None)
+
 # --- Models ---
 class Blacklist(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -13,12 +23,136 @@ class Blacklist(SQLModel, table=True):
 
     __tablename__ = "blacklist"
 
+class BlacklistStats(SQLModel, table=True):
+    original: str = Field(primary_key=True)
+    total: int = Field(default=0)
+    blocked: int = Field(default=0)
+
+    __tablename__ = "blacklist_stats"
+
+class BlacklistJournal(SQLModel, table=True):
+    # Change log of blacklist, in commit order (filled by trigger)
+    seq: Optional[int] = Field(default=None, sa_column=Column(BigInteger, primary_key=True, autoincrement=True))
+    # add / remove / toggle
+    op: str = Field(default="add")
+    malicious: str
+    original: Optional[str] = None
+    # State after the change; None for removals
+    blocked: Optional[int] = None
+    changed_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now()))
+
+    __tablename__ = "blacklist_journal"
+
+class RpzBuildState(SQLModel, table=True):
+    name: str = Field(primary_key=True)
+    # Last journal entry reflected in the zone files
+    seq: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))
+    serial: int = Field(default=0, sa_column=Column(BigInteger, nullable=False, server_default="0"))
+    built_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=True)))
+
+    __tablename__ = "rpz_build_state"
+
+class ResolutionResult(SQLModel, table=True):
+    resolver: str = Field(primary_key=True)
+    domain: str = Field(primary_key=True)
+    exists: bool
+    expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+
+    __tablename__ = "resolution_cache"
+
+class AnalysisJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    domain: str
+    status: str = Field(default="pending", index=True)
+    # Number of generated candidates already verified; restarted jobs resume here
+    position: int = Field(default=0)
+    hits: int = Field(default=0)
+    cancel_requested: bool = Field(default=False)
+    # Resolution cache lookups made by this job's verifier (hits saved an upstream query)
+    cache_hits: int = Field(default=0)
+    cache_misses: int = Field(default=0)
+    worker: Optional[str] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now()))
+    updated_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now()))
+
+    __tablename__ = "analysis_job"
+    __table_args__ = (
+        # At most one pending/running job per domain
+        Index("ux_analysis_job_active_domain", "domain", unique=True,
+              postgresql_where=text("status IN ('pending', 'running')")),
+    )
+
+class UserSession(SQLModel, table=True):
+    id: str = Field(primary_key=True)
+    user_id: str
+    # Database this session works on; None means the default
+    db_key: Optional[str] = None
+    created_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now()))
+    expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False, index=True))
+
+    __tablename__ = "user_sessions"
+
 class ValidDomain(SQLModel):
     domain: str
 
 class BlacklistUpdate(SQLModel):
     blocked: int
 
+class BlacklistCheck(SQLModel):
+    names: List[str]
+
+class PoolMetrics:
+    """Checkout counters for one engine's connection pool."""
+
+    def __init__(self, engine):
+        self.pool = engine.pool
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+
+    def _on_connect(self, *args):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, *args):
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, *args):
+        with self._lock:
+            self.checkins += 1
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.pool.size(),
+                "checked_out": self.pool.checkedout(),
+                "overflow": self.pool.overflow(),
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "wait_avg_ms": round(self.wait_total / self.wait_count * 1000, 3) if self.wait_count else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
 class DatabaseManager:
     _instance = None
     _lock = threading.Lock()
@@ -31,6 +165,9 @@ class DatabaseManager:
                 cls._instance.databases: Dict[str, dict] = {}
                 cls._instance.current_db = ""
                 cls._instance._engine_lock = threading.RLock()
+                cls._instance._engines: Dict[str, tuple] = {}
+                cls._instance._async_engines: Dict[str, tuple] = {}
+                cls._instance._pool_metrics: Dict[str, PoolMetrics] = {}
                 cls._instance.load_config()
         return cls._instance
         
@@ -47,28 +184,110 @@ class DatabaseManager:
                     'port': config.get(section, 'port'),
                     'user': config.get(section, 'user'),
                     'password': config.get(section, 'password'),
-                    'db': config.get(section, 'db', fallback='blacklist_db')
+                    'db': config.get(section, 'db', fallback='blacklist_db'),
+                    'pool_size': config.getint(section, 'pool_size', fallback=5),
+                    'max_overflow': config.getint(section, 'max_overflow', fallback=10),
+                    'pool_timeout': config.getfloat(section, 'pool_timeout', fallback=30.0),
+                    'pool_recycle': config.getint(section, 'pool_recycle', fallback=1800),
+                    'pool_pre_ping': config.getboolean(section, 'pool_pre_ping', fallback=True),
+                    'echo': config.getboolean(section, 'echo', fallback=False),
                 }
                 if not self.current_db:
                     self.current_db = key
     
+    def selected(self) -> str:
+        """The current request's session database, else the default (current_db)."""
+        key = selected_db.get()
+        return key if key in self.databases else self.current_db
+
+    def get_url(self, db_key: Optional[str] = None) -> str:
+        db_config = self.databases[db_key or self.selected()]
+        return (
+            f"postgresql://{db_config['user']}:{db_config['password']}"
+            f"@{db_config['host']}:{db_config['port']}/{db_config['db']}"
+        )
+
     def get_engine(self, db_key: Optional[str] = None):
         with self._engine_lock:
-            key = db_key or self.current_db
+            key = db_key or self.selected()
             if key not in self.databases:
                 raise ValueError(f"Database key '{key}' not found")
+
+            cached = self._engines.get(key)
+            if cached is not None:
+                engine, pid = cached
+                if pid == os.getpid():
+                    return engine
+                # Forked worker: never share the parent's pooled connections
+                engine.dispose(close=False)
             
             db_config = self.databases[key]
-            conn_url = (
-                f"postgresql://{db_config['user']}:{db_config['password']}"
-                f"@{db_config['host']}:{db_config['port']}/{db_config['db']}"
+            engine = create_engine(
+                self.get_url(key),
+                echo=db_config['echo'],
+                pool_size=db_config['pool_size'],
+                max_overflow=db_config['max_overflow'],
+                pool_timeout=db_config['pool_timeout'],
+                pool_recycle=db_config['pool_recycle'],
+                pool_pre_ping=db_config['pool_pre_ping'],
             )
-            return create_engine(conn_url, echo=True)
+            self._pool_metrics[key] = PoolMetrics(engine)
+            self._engines[key] = (engine, os.getpid())
+            return engine
     
+    def get_async_engine(self, db_key: Optional[str] = None) -> AsyncEngine:
+        """asyncpg engine for the event loop; same database and pool settings as get_engine."""
+        with self._engine_lock:
+            key = db_key or self.selected()
+            if key not in self.databases:
+                raise ValueError(f"Database key '{key}' not found")
+
+            cached = self._async_engines.get(key)
+            if cached is not None:
+                engine, pid = cached
+                if pid == os.getpid():
+                    return engine
+                engine.sync_engine.dispose(close=False)
+
+            db_config = self.databases[key]
+            engine = create_async_engine(
+                self.get_url(key).replace("postgresql://", "postgresql+asyncpg://", 1),
+                echo=db_config['echo'],
+                pool_size=db_config['pool_size'],
+                max_overflow=db_config['max_overflow'],
+                pool_timeout=db_config['pool_timeout'],
+                pool_recycle=db_config['pool_recycle'],
+                pool_pre_ping=db_config['pool_pre_ping'],
+            )
+            self._pool_metrics[f"{key}:async"] = PoolMetrics(engine.sync_engine)
+            self._async_engines[key] = (engine, os.getpid())
+            return engine
+
+    def async_session(self, db_key: Optional[str] = None) -> AsyncSession:
+        # Objects stay readable after commit: expired attributes would need a lazy (blocking) load
+        return AsyncSession(self.get_async_engine(db_key), expire_on_commit=False)
+
+    async def get_async_session(self, db_key: Optional[str] = None) -> AsyncGenerator[AsyncSession, None]:
+        key = db_key or self.selected()
+        async with self.async_session(key) as session:
+            started = time.perf_counter()
+            await session.connection()
+            self._pool_metrics[f"{key}:async"].record_wait(time.perf_counter() - started)
+            yield session
+
     def get_session(self, db_key: Optional[str] = None) -> Generator[Session, None, None]:
-        engine = self.get_engine(db_key)
+        key = db_key or self.selected()
+        engine = self.get_engine(key)
         with Session(engine) as session:
+            # Check the connection out up front so pool waits are measured
+            started = time.perf_counter()
+            session.connection()
+            self._pool_metrics[key].record_wait(time.perf_counter() - started)
             yield session
+
+    def get_pool_metrics(self) -> Dict[str, dict]:
+        with self._engine_lock:
+            return {key: metrics.snapshot() for key, metrics in self._pool_metrics.items()}
     
     def get_database_options(self):
         return {key: config['name'] for key, config in self.databases.items()}
@@ -85,4 +304,8 @@ db_manager = DatabaseManager()
 
 # For FastAPI dependency compatibility
 def get_session() -> Generator[Session, None, None]:
-    yield from db_manager.get_session()
\ No newline at end of file
+    yield from db_manager.get_session()
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async for session in db_manager.get_async_session():
+        yield session
\ No newline at end of file
@@ -0,0 +1,156 @@
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+import dns.rdatatype
+import dns.resolver
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select
+from .config import DNS_CACHE_SIZE, DNS_CACHE_NEGATIVE_TTL, DNS_CACHE_MIN_TTL, DNS_CACHE_MAX_TTL
+from .database import AnalysisJob, ResolutionResult
+
+# --- TTL Helpers ---
+def clamp_ttl(ttl: int) -> int:
+    return max(DNS_CACHE_MIN_TTL, min(DNS_CACHE_MAX_TTL, int(ttl)))
+
+def positive_ttl(answer) -> int:
+    return clamp_ttl(answer.rrset.ttl) if answer.rrset is not None else DNS_CACHE_MIN_TTL
+
+def negative_ttl(exc: Exception) -> int:
+    """RFC 2308 negative TTL: min(SOA TTL, SOA MINIMUM) from the authority section."""
+    responses = []
+    try:
+        if isinstance(exc, dns.resolver.NXDOMAIN):
+            responses = list(exc.responses().values())
+        elif isinstance(exc, dns.resolver.NoAnswer):
+            responses = [exc.response()]
+    except Exception:
+        responses = []
+
+    for response in responses:
+        for rrset in response.authority:
+            if rrset.rdtype == dns.rdatatype.SOA:
+                return clamp_ttl(min(rrset.ttl, rrset[0].minimum))
+    return DNS_CACHE_NEGATIVE_TTL
+
+# --- Resolution Cache ---
+class ResolutionCache:
+    """
+    Positive/negative resolution outcomes keyed by (resolver, domain).
+    Lookups only touch the in-process LRU; `prefetch` loads a batch of rows from the
+    resolution_cache table and `flush` writes new outcomes back in one statement.
+    """
+
+    def __init__(self, max_entries: int = DNS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[bool, float]]" = OrderedDict()
+        self._pending: Dict[Tuple[str, str], Tuple[bool, float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key: Tuple[str, str], exists: bool, expires_at: float):
+        self._entries[key] = (exists, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, resolver: str, domain: str) -> Optional[bool]:
+        key = (resolver, domain)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, resolver: str, domain: str, exists: bool, ttl: int):
+        key = (resolver, domain)
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, exists, expires_at)
+            self._pending[key] = (exists, expires_at)
+
+    def prefetch(self, engine, domains: Iterable[str]):
+        missing = [domain for domain in domains if not self._cached(domain)]
+        if not missing:
+            return
+        now = datetime.now(timezone.utc)
+        with Session(engine) as session:
+            rows = session.exec(
+                select(ResolutionResult)
+                .where(ResolutionResult.domain.in_(missing))
+                .where(ResolutionResult.expires_at > now)
+            ).all()
+        with self._lock:
+            for row in rows:
+                self._remember((row.resolver, row.domain), row.exists, row.expires_at.timestamp())
+
+    def _cached(self, domain: str) -> bool:
+        # Any stage being present means the table has nothing newer for this domain
+        with self._lock:
+            return any(key in self._entries for key in (("google", domain), ("quad9", domain)))
+
+    def flush(self, engine):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+        rows = [
+            {
+                "resolver": resolver,
+                "domain": domain,
+                "exists": exists,
+                "expires_at": datetime.fromtimestamp(expires_at, timezone.utc),
+            }
+            for (resolver, domain), (exists, expires_at) in pending.items()
+        ]
+        stmt = insert(ResolutionResult).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["resolver", "domain"],
+            set_={"exists": stmt.excluded.exists, "expires_at": stmt.excluded.expires_at},
+        )
+        with Session(engine) as session:
+            session.execute(stmt)
+            session.commit()
+
+    def purge_expired(self, engine):
+        with Session(engine) as session:
+            session.execute(delete(ResolutionResult).where(ResolutionResult.expires_at <= datetime.now(timezone.utc)))
+            session.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "pending_writes": len(self._pending),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+# Shared by every verifier in this process
+resolution_cache = ResolutionCache()
+
+def cache_usage(session: Session) -> dict:
+    """Cache counters summed over every analysis job, and the unexpired rows in the table."""
+    hits, misses = session.exec(
+        select(func.coalesce(func.sum(AnalysisJob.cache_hits), 0), func.coalesce(func.sum(AnalysisJob.cache_misses), 0))
+    ).one()
+    entries = session.exec(
+        select(func.count()).select_from(ResolutionResult).where(ResolutionResult.expires_at > datetime.now(timezone.utc))
+    ).one()
+    lookups = hits + misses
+    return {
+        "entries": entries,
+        "hits": hits,
+        "misses": misses,
+        "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+    }
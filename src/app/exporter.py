@@ -0,0 +1,94 @@
+import csv
+import io
+import json
+import struct
+import zlib
+from typing import Iterator, Optional, Sequence
+from sqlmodel import select
+from .config import EXPORT_FETCH_SIZE
+from .database import Blacklist, db_manager
+
+EXPORT_FORMATS = ("ndjson", "csv", "binary")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv", "binary": "application/octet-stream"}
+
+# Binary export: BINARY_MAGIC, then per row
+#   id (u64) | blocked (u8) | len (u16) + malicious | len (u16) + original   (big-endian, UTF-8)
+BINARY_MAGIC = b"DIBX\x01"
+_ROW_HEADER = struct.Struct(">QB")
+_LENGTH = struct.Struct(">H")
+
+# --- Keyset Export ---
+def iter_partitions(db_key: str, after: int = 0, limit: Optional[int] = None,
+                    blocked: Optional[int] = None, original: Optional[str] = None) -> Iterator[Sequence]:
+    """Rows with id > after in id order, read through a server-side cursor."""
+    query = (
+        select(Blacklist.id, Blacklist.original, Blacklist.malicious, Blacklist.blocked)
+        .where(Blacklist.id > after)
+        .order_by(Blacklist.id)
+    )
+    if blocked is not None:
+        query = query.where(Blacklist.blocked == blocked)
+    if original:
+        query = query.where(Blacklist.original == original)
+    if limit:
+        query = query.limit(limit)
+
+    with db_manager.get_engine(db_key).connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE).execute(query)
+        yield from result.partitions()
+
+def _encode_ndjson(rows) -> bytes:
+    return "".join(
+        json.dumps({"id": id, "original": original, "malicious": malicious, "blocked": blocked}) + "\n"
+        for id, original, malicious, blocked in rows
+    ).encode()
+
+def _encode_csv(rows) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode()
+
+def _encode_binary(rows) -> bytes:
+    parts = []
+    for id, original, malicious, blocked in rows:
+        malicious_bytes, original_bytes = malicious.encode(), original.encode()
+        parts += [
+            _ROW_HEADER.pack(id, blocked),
+            _LENGTH.pack(len(malicious_bytes)), malicious_bytes,
+            _LENGTH.pack(len(original_bytes)), original_bytes,
+        ]
+    return b"".join(parts)
+
+ENCODERS = {"ndjson": _encode_ndjson, "csv": _encode_csv, "binary": _encode_binary}
+
+def export_stream(db_key: str, fmt: str, after: int = 0, limit: Optional[int] = None,
+                  blocked: Optional[int] = None, original: Optional[str] = None,
+                  gzip: bool = False) -> Iterator[bytes]:
+    """
+    Encodes the export one cursor partition at a time, optionally gzip-compressed.
+    When `limit` cuts the export short, NDJSON ends with {"next": <id>}; other formats
+    continue from the last id they received.
+    """
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS) if gzip else None
+
+    def emit(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    encode = ENCODERS[fmt]
+    if fmt == "csv":
+        yield emit(b"id,original,malicious,blocked\n")
+    elif fmt == "binary":
+        yield emit(BINARY_MAGIC)
+
+    count, last_id = 0, after
+    for rows in iter_partitions(db_key, after, limit, blocked, original):
+        count += len(rows)
+        last_id = rows[-1][0]
+        chunk = emit(encode(rows))
+        if chunk:
+            yield chunk
+
+    if fmt == "ndjson" and limit and count >= limit:
+        yield emit(json.dumps({"next": last_id}).encode() + b"\n")
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,77 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Iterator, Optional, Tuple
+
+# (malicious, original or None, blocked or None) as found in the upload
+Record = Tuple[str, Optional[str], Optional[int]]
+
+IMPORT_FORMATS = ("ndjson", "csv", "hosts")
+
+# Names hosts files map to themselves rather than to a blocked domain
+HOSTS_IGNORED = {"localhost", "localhost.localdomain", "local", "broadcasthost",
+                 "ip6-localhost", "ip6-loopback", "0.0.0.0", "127.0.0.1", "::1"}
+
+# --- Upload Parsing ---
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Splits a streamed UTF-8 body into lines without buffering more than one line."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+def parse_blocked(value) -> int:
+    """0 or 1; anything else makes the line unparseable, like an invalid name."""
+    blocked = int(value)
+    if blocked not in (0, 1) or (isinstance(value, float) and value != blocked):
+        raise ValueError(f"blocked must be 0 or 1, got {value!r}")
+    return blocked
+
+def parse_ndjson(line: str) -> Iterator[Record]:
+    item = json.loads(line)
+    if isinstance(item, str):
+        yield item, None, None
+    elif isinstance(item, dict) and item.get("malicious"):
+        blocked = item.get("blocked")
+        yield item["malicious"], item.get("original"), None if blocked is None else parse_blocked(blocked)
+
+def parse_csv(line: str) -> Iterator[Record]:
+    # malicious[,original[,blocked]]; a header row is skipped
+    for row in csv.reader([line]):
+        if not row or not row[0].strip() or row[0].strip().lower() == "malicious":
+            continue
+        original = row[1].strip() if len(row) > 1 and row[1].strip() else None
+        blocked = parse_blocked(row[2]) if len(row) > 2 and row[2].strip() else None
+        yield row[0], original, blocked
+
+def parse_hosts(line: str) -> Iterator[Record]:
+    # "0.0.0.0 evil.com other.com" or a bare "evil.com"
+    fields = line.split("#", 1)[0].split()
+    if len(fields) > 1:
+        fields = fields[1:]
+    for name in fields:
+        if name.lower() not in HOSTS_IGNORED:
+            yield name, None, None
+
+PARSERS = {"ndjson": parse_ndjson, "csv": parse_csv, "hosts": parse_hosts}
+
+async def iter_records(chunks: AsyncIterator[bytes], fmt: str) -> AsyncIterator[Tuple[Optional[Record], bool]]:
+    """Yields (record, False) per parsed entry and (None, True) per unparseable line."""
+    parse = PARSERS[fmt]
+    async for line in iter_lines(chunks):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            records = list(parse(line))
+        except (ValueError, TypeError):
+            yield None, True
+            continue
+        for record in records:
+            yield record, False
@@ -0,0 +1,47 @@
+import argparse
+import time
+from multiprocessing import Process
+from sqlmodel import Session
+from .config import JOB_POLL_INTERVAL, JOB_WORKER_PROCESSES
+from .database import db_manager
+from .jobs import claim_job, run_job, default_worker_id
+
+# --- Analysis Worker Pool ---
+# Run next to the web app:  python -m app.job_worker --processes 4
+def work_forever(poll_interval: float = JOB_POLL_INTERVAL):
+    worker_id = default_worker_id()
+    print(f"Analysis worker {worker_id} started")
+    while True:
+        claimed = False
+        for db_key in db_manager.databases:
+            try:
+                with Session(db_manager.get_engine(db_key)) as session:
+                    job = claim_job(session, worker_id)
+                if job is None:
+                    continue
+                claimed = True
+                print(f"[{worker_id}] job #{job.id} {job.domain} ({db_key}) from position {job.position}")
+                run_job(db_key, job, worker_id)
+            except Exception as e:
+                print(f"[{worker_id}] error while processing {db_key}: {e}")
+        if not claimed:
+            time.sleep(poll_interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Lookalike analysis worker pool")
+    parser.add_argument("--processes", type=int, default=JOB_WORKER_PROCESSES)
+    parser.add_argument("--poll-interval", type=float, default=JOB_POLL_INTERVAL)
+    args = parser.parse_args()
+
+    processes = [
+        # Not daemonic, so each worker may run its own generation process pool
+        Process(target=work_forever, args=(args.poll_interval,))
+        for _ in range(max(1, args.processes))
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import socket
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from sqlalchemy import text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlmodel import Session, select, or_, and_
+from .config import JOB_STALE_AFTER
+from .database import AnalysisJob, ValidDomain, db_manager
+from .dns_cache import resolution_cache
+from .lookalike import worker
+
+ACTIVE_STATUSES = ("pending", "running")
+
+# --- Job Queue ---
+def enqueue_job(session: Session, domain: str) -> AnalysisJob:
+    """Queues an analysis, or returns the pending/running job already queued for `domain`."""
+    stmt = (
+        insert(AnalysisJob)
+        .values(domain=domain)
+        .on_conflict_do_nothing(
+            index_elements=["domain"],
+            index_where=text("status IN ('pending', 'running')"),
+        )
+        .returning(AnalysisJob.id)
+    )
+    while True:
+        job_id = session.execute(stmt).scalar()
+        session.commit()
+        if job_id is not None:
+            return session.get(AnalysisJob, job_id)
+        job = session.exec(
+            select(AnalysisJob)
+            .where(AnalysisJob.domain == domain)
+            .where(AnalysisJob.status.in_(ACTIVE_STATUSES))
+        ).one_or_none()
+        if job is not None:
+            return job
+        # The conflicting job finished in between; queue a new one
+
+def list_jobs(session: Session, status: Optional[str] = None, offset: int = 0, limit: int = 100) -> List[AnalysisJob]:
+    query = select(AnalysisJob).order_by(AnalysisJob.id.desc())
+    if status:
+        query = query.where(AnalysisJob.status == status)
+    return session.exec(query.offset(offset).limit(limit)).all()
+
+def cancel_job(session: Session, job: AnalysisJob) -> AnalysisJob:
+    if job.status == "pending":
+        job.status = "cancelled"
+    elif job.status == "running":
+        # The worker stops at its next checkpoint
+        job.cancel_requested = True
+    job.updated_at = datetime.now(timezone.utc)
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+def claim_job(session: Session, worker_id: str) -> Optional[AnalysisJob]:
+    """Takes the oldest pending job, or a running one whose worker stopped checkpointing."""
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=JOB_STALE_AFTER)
+    # A stale job whose cancel was requested has no worker left to honour it
+    session.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.status == "running")
+        .where(AnalysisJob.cancel_requested)
+        .where(AnalysisJob.updated_at < stale_before)
+        .values(status="cancelled", updated_at=now)
+    )
+    session.commit()
+    job = session.exec(
+        select(AnalysisJob)
+        .where(or_(
+            AnalysisJob.status == "pending",
+            and_(AnalysisJob.status == "running", AnalysisJob.updated_at < stale_before,
+                 AnalysisJob.cancel_requested.is_(False)),
+        ))
+        .order_by(AnalysisJob.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    ).first()
+    if job is None:
+        session.rollback()
+        return None
+
+    job.status = "running"
+    job.worker = worker_id
+    job.updated_at = datetime.now(timezone.utc)
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+def run_job(db_key: str, job: AnalysisJob, worker_id: str):
+    engine = db_manager.get_engine(db_key)
+    # The process-wide cache outlives the job; only lookups made from here on count
+    base_hits, base_misses = resolution_cache.hits, resolution_cache.misses
+
+    def record_cache_usage(current: AnalysisJob):
+        current.cache_hits = job.cache_hits + resolution_cache.hits - base_hits
+        current.cache_misses = job.cache_misses + resolution_cache.misses - base_misses
+
+    def checkpoint(position: int, hits: int) -> bool:
+        with Session(engine) as session:
+            current = session.get(AnalysisJob, job.id)
+            if current.worker != worker_id:
+                # Re-claimed by another worker after we looked stale
+                return False
+            current.position = position
+            current.hits = job.hits + hits
+            record_cache_usage(current)
+            current.updated_at = datetime.now(timezone.utc)
+            if current.cancel_requested:
+                current.status = "cancelled"
+            session.add(current)
+            session.commit()
+            return current.status == "running"
+
+    try:
+        worker(ValidDomain(domain=job.domain), db_key=db_key,
+               start_position=job.position, on_checkpoint=checkpoint)
+        final_status, error = "done", None
+    except Exception as e:
+        final_status, error = "failed", str(e)
+
+    with Session(engine) as session:
+        current = session.get(AnalysisJob, job.id)
+        if current.status == "running" and current.worker == worker_id:
+            current.status = final_status
+            current.error = error
+            record_cache_usage(current)
+            current.updated_at = datetime.now(timezone.utc)
+            session.add(current)
+            session.commit()
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
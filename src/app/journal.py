@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlmodel import select
+from .config import JOURNAL_RETENTION
+from .database import Blacklist, db_manager
+
+# --- Blacklist Journal ---
+# blacklist_journal is filled by triggers (see migrations) with every name a write
+# touched; consumers remember the last seq they applied and re-read the current
+# state of the names written after it.
+# The triggers hold a global advisory lock until commit so seqs become visible in order.
+# Every blacklist writer here (API, bulk import, startup seed) is one statement per
+# transaction; a writer that issues several must take the same lock before its first
+# write, or it can deadlock against another writer.
+def journal_position(conn: Connection) -> int:
+    return conn.execute(text("SELECT coalesce(max(seq), 0) FROM blacklist_journal")).scalar()
+
+def journal_floor(conn: Connection) -> Optional[int]:
+    """Oldest retained seq, or None when the journal is empty."""
+    return conn.execute(text("SELECT min(seq) FROM blacklist_journal")).scalar()
+
+def compacted_past(conn: Connection, since: int) -> bool:
+    """True when entries after `since` were compacted away, so a consumer must reload in full."""
+    floor = journal_floor(conn)
+    return floor is not None and since < floor - 1
+
+def read_journal(conn: Connection, since: int, limit: int) -> Tuple[int, Set[str]]:
+    """Names touched after `since` (at most `limit` entries) and the seq they reach."""
+    entries = conn.execute(
+        text("SELECT seq, malicious FROM blacklist_journal WHERE seq > :since ORDER BY seq LIMIT :limit"),
+        {"since": since, "limit": limit},
+    ).all()
+    if not entries:
+        return since, set()
+    return entries[-1].seq, {entry.malicious for entry in entries}
+
+def blocked_among(conn: Connection, names: Iterable[str]) -> List[str]:
+    names = list(names)
+    if not names:
+        return []
+    return conn.execute(
+        select(Blacklist.malicious).where(Blacklist.blocked == 1).where(Blacklist.malicious.in_(names))
+    ).scalars().all()
+
+def read_changes(conn: Connection, since: int, limit: int) -> list:
+    """Journal entries after `since` as compact [seq, op, malicious, original, blocked] rows."""
+    return [
+        list(entry) for entry in conn.execute(
+            text("""
+                SELECT seq, op, malicious, original, blocked FROM blacklist_journal
+                WHERE seq > :since ORDER BY seq LIMIT :limit
+            """),
+            {"since": since, "limit": limit},
+        )
+    ]
+
+# --- Compaction ---
+def compact_journal(engine, retention: float = JOURNAL_RETENTION) -> int:
+    """
+    Deletes entries older than `retention` that every zone build has already applied
+    (databases nobody builds zones from are bounded by age alone). The newest entry is
+    always kept so the retained range still marks the position.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=retention)
+    with engine.begin() as conn:
+        return conn.execute(text("""
+            DELETE FROM blacklist_journal
+            WHERE changed_at < :cutoff
+              AND seq < (SELECT max(seq) FROM blacklist_journal)
+              AND seq <= coalesce((SELECT min(seq) FROM rpz_build_state), (SELECT max(seq) FROM blacklist_journal))
+        """), {"cutoff": cutoff}).rowcount
+
+def compact_journals() -> dict:
+    return {db_key: compact_journal(db_manager.get_engine(db_key)) for db_key in db_manager.databases}
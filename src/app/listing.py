@@ -0,0 +1,53 @@
+from typing import Optional, Tuple
+from sqlalchemy import func, literal_column
+from sqlmodel import Session, select
+from .config import LISTING_COUNT_CAP
+from .database import Blacklist
+from .stats import aggregate_stats
+
+# --- Blacklist Listing ---
+# Sort keys a client may ask for, each backed by an index (malicious by the normalized unique one).
+# The '.' is inlined: a bound parameter would not match the index expression in a generic plan.
+SORT_COLUMNS = {
+    "id": Blacklist.id,
+    "original": Blacklist.original,
+    "malicious": func.lower(func.rtrim(Blacklist.malicious, literal_column("'.'"))),
+}
+
+def _like_pattern(search: str) -> str:
+    escaped = search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+def apply_filters(query, search: Optional[str] = None, blocked: Optional[int] = None, original: Optional[str] = None):
+    if search:
+        # Served by the trigram index on malicious
+        query = query.where(Blacklist.malicious.ilike(_like_pattern(search.strip()), escape='\\'))
+    if blocked is not None:
+        query = query.where(Blacklist.blocked == blocked)
+    if original:
+        query = query.where(Blacklist.original == original)
+    return query
+
+def count_entries(session: Session, search: Optional[str] = None, blocked: Optional[int] = None,
+                  original: Optional[str] = None) -> Tuple[int, bool]:
+    """(count, exact). Unsearched counts come from blacklist_stats; searches stop at LISTING_COUNT_CAP."""
+    if not search:
+        stats = aggregate_stats(session)
+        entries = [stats[original]] if original in stats else [] if original else stats.values()
+        key = "total" if blocked is None else "blocked" if blocked else "unblocked"
+        return sum(entry[key] for entry in entries), True
+    capped = apply_filters(select(Blacklist.id), search, blocked, original).limit(LISTING_COUNT_CAP + 1).subquery()
+    count = session.exec(select(func.count()).select_from(capped)).one()
+    return min(count, LISTING_COUNT_CAP), count <= LISTING_COUNT_CAP
+
+def list_page(session: Session, offset: int = 0, limit: int = 50, sort: str = "id", descending: bool = False,
+              search: Optional[str] = None, blocked: Optional[int] = None, original: Optional[str] = None) -> dict:
+    """One page of the filtered, sorted blacklist plus the size of the whole result."""
+    column = SORT_COLUMNS.get(sort, Blacklist.id)
+    order = [column.desc() if descending else column.asc()]
+    if sort != "id":
+        order.append(Blacklist.id)
+    query = apply_filters(select(Blacklist), search, blocked, original)
+    rows = session.exec(query.order_by(*order).offset(offset).limit(limit)).all()
+    total, exact = count_entries(session, search, blocked, original)
+    return {"rows": rows, "total": total, "exact": exact}
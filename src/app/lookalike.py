@@ -1,91 +1,80 @@
-from .config import KEYWORDS, TLDS, SIMILAR_CHARS
-from .database import Blacklist, get_session, ValidDomain, db_manager
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+from typing import Callable, Optional
+from .config import KEYWORDS, TLDS, SIMILAR_CHARS, JOB_CHECKPOINT_EVERY
+from .config import GENERATION_PROCESSES, GENERATION_SHARD_SIZE
+from .database import Blacklist, ValidDomain, db_manager
+from .verifier import DomainVerifier
+from .utils import chunked
+from .bulk import BlacklistWriter
+from .dns_cache import resolution_cache
+from .public_suffix import split_domain
+from .codec import canonical_name, canonical_names
 from sqlmodel import select, Session
 from jellyfish import jaro_winkler_similarity
-import dns.resolver
-def strip_tld(url):
-    tld_list = ["com", "ru", "org", "in", "net", "uk", "info", "co", "au", "ai", "tk", "nl", "de", "cn"]
-    
-    def all_following_component_are_tld(components):
-        for component in components:
-            if component not in tld_list:
-                return False
-        return True
-
-    components = url.split('.')
-    domain = ""
-    tld = []
-    for idx, component in enumerate(components):
-        if component in tld_list and all_following_component_are_tld(components[idx:]):
-            domain = components[idx - 1]
-            tld = components[idx:]
-            break
-    if tld:
-        return domain, ".".join(tld)
-    return None, None
 
-def generate_typos(domain, tlds=None):
+TYPO_CHARS = 'abcdefghijklmnopqrstuvwxyz0123456789.-_'
+JARO_WINKLER_ALPHABET = 'abcdefghijklmnopqrstuvwxyz'
+JARO_WINKLER_THRESHOLD = 0.8
+
+# --- Candidate Generators ---
+# Every generator is lazy; duplicates are removed once, in generate_lookalikes.
+def _indexes(positions, upper):
+    """Character positions below `upper`, optionally restricted to a shard's range."""
+    if positions is None:
+        return range(upper)
+    return [i for i in positions if 0 <= i < upper]
+
+def generate_typos(domain, tlds=None, positions=None):
     if tlds is None:
         tlds = TLDS
-    typos = set()
     for tld in tlds:
-        for i in range(len(domain) + 1):
-            for c in 'abcdefghijklmnopqrstuvwxyz0123456789.-_':
-                typo = domain[:i] + c + domain[i:] + '.' + tld
-                typos.add(typo)
-        for i in range(len(domain)):
-            typo = domain[:i] + domain[i+1:] + '.' + tld
-            typos.add(typo)
-        for i in range(len(domain)):
-            for c in 'abcdefghijklmnopqrstuvwxyz0123456789.-_':
+        for i in _indexes(positions, len(domain) + 1):
+            for c in TYPO_CHARS:
+                yield domain[:i] + c + domain[i:] + '.' + tld
+        for i in _indexes(positions, len(domain)):
+            yield domain[:i] + domain[i+1:] + '.' + tld
+        for i in _indexes(positions, len(domain)):
+            for c in TYPO_CHARS:
                 if c != domain[i]:
-                    typo = domain[:i] + c + domain[i+1:] + '.' + tld
-                    typos.add(typo)
-        for i in range(len(domain) - 1):
-            typo = domain[:i] + domain[i+1] + domain[i] + domain[i+2:] + '.' + tld
-            typos.add(typo)
-    return typos
-
-def generate_jaro_winkler(domain, tlds=None):
+                    yield domain[:i] + c + domain[i+1:] + '.' + tld
+        for i in _indexes(positions, len(domain) - 1):
+            yield domain[:i] + domain[i+1] + domain[i] + domain[i+2:] + '.' + tld
+
+def generate_jaro_winkler(domain, tlds=None, positions=None):
     if tlds is None:
         tlds = TLDS
 
-    alphabet = 'abcdefghijklmnopqrstuvwxyz'
-    typos = []
     for tld in tlds:
-        for i in range(len(domain)):
-            for char in alphabet:
-                typo = domain[:i] + char + domain[i+1:] + '.' + tld
-                if typo != domain and jaro_winkler_similarity(domain, typo) > 0.8:
-                    typos.append(typo)
-
-                typo = domain[:i] + domain[i+1:] + '.' + tld
-                if typo != domain and jaro_winkler_similarity(domain, typo) > 0.8:
-                    typos.append(typo)
-
-                if i < len(domain) - 1:
-                    typo = domain[:i] + domain[i+1] + domain[i] + domain[i+2:] + '.' + tld
-                    if typo != domain and jaro_winkler_similarity(domain, typo) > 0.8:
-                        typos.append(typo)
-
-                typo = domain[:i] + char + domain[i:] + '.' + tld
-                if typo != domain and jaro_winkler_similarity(domain, typo) > 0.8:
-                    typos.append(typo)
-
-    return list(set(typos))
+        # Each distinct string is scored once per TLD
+        scored = set()
+        for i in _indexes(positions, len(domain)):
+            # Deletion and transposition don't depend on the alphabet letter
+            variants = [domain[:i] + domain[i+1:]]
+            if i < len(domain) - 1:
+                variants.append(domain[:i] + domain[i+1] + domain[i] + domain[i+2:])
+            for char in JARO_WINKLER_ALPHABET:
+                variants.append(domain[:i] + char + domain[i+1:])
+                variants.append(domain[:i] + char + domain[i:])
+
+            for variant in variants:
+                typo = variant + '.' + tld
+                if typo in scored:
+                    continue
+                scored.add(typo)
+                if jaro_winkler_similarity(domain, typo) > JARO_WINKLER_THRESHOLD:
+                    yield typo
 
 def generate_homographs(domain, tlds=None):
     if tlds is None:
         tlds = TLDS
 
-    homograph_domains = set()
     for char in domain:
         if char.lower() in SIMILAR_CHARS:
             homographs = SIMILAR_CHARS[char.lower()]
             for homograph in homographs:
                 for tld in tlds:
-                    homograph_domains.add(domain.replace(char, homograph) + '.' + tld)
-    return homograph_domains
+                    yield domain.replace(char, homograph) + '.' + tld
 
 def generate_ribbon_domains(domain, keywords=None, tlds=None):
     if keywords is None:
@@ -94,75 +83,113 @@ def generate_ribbon_domains(domain, keywords=None, tlds=None):
     if tlds is None:
         tlds = TLDS
 
-    ribbon_domains = set()
     for keyword in keywords:
         for tld in tlds:
-            ribbon_domain = f"{domain}-{keyword}.{tld}"
-            ribbon_domains.add(ribbon_domain)
-    return ribbon_domains
-
-# --- DNS Functions ---
-def check_domain_existence(domain: str) -> bool:
-    resolver = dns.resolver.Resolver()
-    resolver.nameservers = ['8.8.8.8']
-    try:
-        resolver.resolve(domain, 'A', lifetime=5.0)
-        return True
-    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, 
-            dns.resolver.NoNameservers, dns.exception.Timeout):
-        return False
-    except Exception as e:
-        return False
-
-def check_domain_with_quad9(domain: str) -> bool:
-    QUAD9_DNS_SERVER = '9.9.9.9'
-    try:
-        resolver = dns.resolver.Resolver(configure=False)
-        resolver.nameservers = [QUAD9_DNS_SERVER]
-        answers = resolver.resolve(domain)
-        return bool(answers)
-    except Exception as e:
-        return False
+            yield f"{domain}-{keyword}.{tld}"
+
+def generate_shard(domain, tld, start, stop):
+    """Typos and Jaro-Winkler candidates for positions [start, stop) of `domain` under one TLD."""
+    positions = range(start, stop)
+    return list(chain(
+        generate_typos(domain, [tld], positions),
+        generate_jaro_winkler(domain, [tld], positions),
+    ))
+
+def generate_shards(domain, tlds=None, processes=0):
+    """
+    Yields the candidate lists of every (TLD, position range) shard in a fixed order.
+    With processes > 1 the shards are computed by a process pool; the order, and so the
+    positions jobs checkpoint at, is the same either way.
+    """
+    if tlds is None:
+        tlds = TLDS
+    shards = [
+        (domain, tld, start, start + GENERATION_SHARD_SIZE)
+        for tld in tlds
+        for start in range(0, len(domain) + 1, GENERATION_SHARD_SIZE)
+    ]
+    if processes and processes > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            yield from pool.map(generate_shard, *zip(*shards))
+    else:
+        for shard in shards:
+            yield generate_shard(*shard)
+
+def generate_lookalikes(domain, tlds=None, exclude=(), processes=GENERATION_PROCESSES):
+    """
+    Streams the candidates of every generator in a stable order, each name once.
+    Names in `exclude` (already blacklisted variants, the authentic domain) are skipped.
+    """
+    seen = set(exclude)
+    generators = chain(
+        chain.from_iterable(generate_shards(domain, tlds, processes)),
+        generate_homographs(domain, tlds),
+        generate_ribbon_domains(domain, tlds=tlds),
+    )
+    for candidate in generators:
+        if candidate not in seen:
+            seen.add(candidate)
+            yield candidate
 
 # --- Worker Function ---
-def worker(session: Session, valid_domain: ValidDomain, commit_every=50):
-    engine = db_manager.get_engine()
+def worker(valid_domain: ValidDomain, db_key: Optional[str] = None, start_position: int = 0,
+           on_checkpoint: Optional[Callable[[int, int], bool]] = None,
+           checkpoint_every: int = JOB_CHECKPOINT_EVERY):
+    """
+    Verifies every lookalike of `valid_domain` and blacklists the ones that resolve.
+
+    Candidates are processed in blocks of `checkpoint_every`; after each block the hits are
+    committed and `on_checkpoint(position, hits)` is called. Returning False from it stops
+    the analysis. `start_position` skips candidates verified by an earlier run.
+    """
+    engine = db_manager.get_engine(db_key)
+    try:
+        authentic_name = canonical_name(valid_domain.domain)
+    except ValueError as e:
+        print(f"Couldn't extract domain from: {valid_domain.domain} ({e})")
+        return
+    authentic_domain = authentic_name.rstrip('.')
+    _domain, _tld = split_domain(authentic_domain)
+    if not _domain:
+        print(f"Couldn't extract domain from: {valid_domain.domain}")
+        return
+
+    print("="*10)
+    print(_domain)
+    print("="*10)
+
     with Session(engine) as session:
-        _domain, _tld = strip_tld(valid_domain.domain)
-        if not _domain:
-            print(f"Couldn't extract domain from: {valid_domain.domain}")
-            return
-            
-        print("="*10)
-        print(_domain)
-        print("="*10)
-        typos = generate_typos(_domain)
-        homographs = generate_homographs(_domain)
-        ribbon_domains = generate_ribbon_domains(_domain)
-        jaro_winkler = generate_jaro_winkler(_domain)
-
-        all_lookalike_domains = [*typos, *homographs, *ribbon_domains, *jaro_winkler]
-
-        domain_idx = 0
-
-        existing_blacklists = session.exec(select(Blacklist).where(Blacklist.original == f"{valid_domain.domain}.")).all()
-        existing_malicious_variants = [bl.malicious[:-1] for bl in existing_blacklists] if existing_blacklists else []
-
-        print("="*10)
-        print(existing_blacklists)
-        print("="*10)
-
-        for domain in all_lookalike_domains:
-            if domain not in existing_malicious_variants:
-                if check_domain_existence(domain):
-                    if check_domain_with_quad9(domain):
-                        session.add(
-                            Blacklist(original=f"{valid_domain.domain}.", malicious=f"{domain}.")
-                        )
-
-                        if domain_idx % commit_every == 0:
-                            session.commit()
-
-                        domain_idx += 1
-
-        session.commit()
+        existing_malicious_variants = set(
+            session.exec(select(Blacklist.malicious).where(Blacklist.original == authentic_name)).all()
+        )
+
+    print("="*10)
+    print(f"{len(existing_malicious_variants)} known variants")
+    print("="*10)
+
+    # Known variants are filtered after slicing so positions stay stable across restarts
+    candidates = islice(generate_lookalikes(_domain, exclude={authentic_domain}), start_position, None)
+    verifier = DomainVerifier(engine=engine)
+    writer = BlacklistWriter(engine)
+    position = start_position
+    total_hits = 0
+    for block in chunked(candidates, checkpoint_every):
+        # Homographs are verified and stored in the canonical (Punycode) form the resolvers see;
+        # candidates IDNA would map onto another name come back as None
+        names, _ = canonical_names(block)
+        unknown = [
+            name.rstrip('.') for name in dict.fromkeys(names)
+            if name is not None and name != authentic_name and name not in existing_malicious_variants
+        ]
+        for domain in verifier.run(unknown):
+            writer.add(authentic_name, f"{domain}.")
+            existing_malicious_variants.add(f"{domain}.")
+            total_hits += 1
+        # Hits are durable before the checkpoint that skips past them
+        writer.flush()
+
+        position += len(block)
+        if on_checkpoint and on_checkpoint(position, total_hits) is False:
+            break
+
+    resolution_cache.purge_expired(engine)
@@ -1,9 +1,21 @@
+import asyncio
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from .database import db_manager, SQLModel, Blacklist
 from .auth import auth_middleware, init_admin_password
 from .api import router as api_router
+from .migrations import run_migrations
+from .background import start_periodic, stop_periodic
+from .rpz import compile_resolver_zones
+from .blocklist import blocklist_mirror
+from .journal import compact_journals
+from .notify import start_brokers, stop_brokers
+from .sessions import session_store
+from .purge import cache_purge_queue
+from .unbound import unbound_sync
+from .config import RPZ_INTERVAL, SNAPSHOT_INTERVAL, JOURNAL_COMPACT_INTERVAL, SESSION_SWEEP_INTERVAL
 from .ui import setup_ui 
+from sqlalchemy.dialects.postgresql import insert
 from sqlmodel import Session, SQLModel, select
 # --- FastAPI App Setup ---
 @asynccontextmanager
@@ -14,28 +26,38 @@ async def lifespan(app: FastAPI):
     if not db_manager.databases:
         raise RuntimeError("No databases configured")
     
-    # Create database tables in all configured databases
+    # Bring every configured database up to the current schema
     for db_key, db_config in db_manager.databases.items():
         try:
             engine = db_manager.get_engine(db_key)
-            SQLModel.metadata.create_all(engine)
+            run_migrations(engine)
             # Add dummy data
             with Session(engine) as session:
-                    dummy_data = [ 
-                        Blacklist(original="facebook.com.", malicious="facedook.com."),
-                        Blacklist(original="facebook.com.", malicious="facebo0k.com."),
-                        Blacklist(original="bankok.com.", malicious="dankok.com."),
-                        Blacklist(original="microsoft.com.", malicious="rnicrosoft.com."),
-                        Blacklist(original="google.com.", malicious="goog1e.com."),
+                    dummy_data = [
+                        {"original": "facebook.com.", "malicious": "facedook.com."},
+                        {"original": "facebook.com.", "malicious": "facebo0k.com."},
+                        {"original": "bankok.com.", "malicious": "dankok.com."},
+                        {"original": "microsoft.com.", "malicious": "rnicrosoft.com."},
+                        {"original": "google.com.", "malicious": "goog1e.com."},
                     ]
-                    for bl in dummy_data:
-                        if not session.exec(select(Blacklist).where(Blacklist.malicious == bl.malicious)).first():
-                            session.add(bl)
-                    
+                    session.execute(insert(Blacklist).values(dummy_data).on_conflict_do_nothing())
                     session.commit()
         except Exception as e:
             raise
+
+    background_tasks = start_periodic([
+        ("rpz", compile_resolver_zones, RPZ_INTERVAL),
+        ("blocklist", blocklist_mirror.refresh, SNAPSHOT_INTERVAL),
+        ("journal-compaction", compact_journals, JOURNAL_COMPACT_INTERVAL),
+        ("session-sweep", session_store.sweep, SESSION_SWEEP_INTERVAL),
+    ])
+    start_brokers()
+    background_tasks.append(asyncio.create_task(blocklist_mirror.follow()))
+    background_tasks.append(asyncio.create_task(cache_purge_queue.follow()))
+    background_tasks.append(asyncio.create_task(unbound_sync.follow()))
     yield
+    await stop_periodic(background_tasks)
+    await asyncio.to_thread(stop_brokers)
 
 app = FastAPI(lifespan=lifespan)
 app.middleware("http")(auth_middleware)
@@ -0,0 +1,379 @@
+import sys
+from typing import Callable, List, Tuple
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from .database import db_manager
+from .codec import canonical_names
+from .config import EXPORT_FETCH_SIZE
+
+# --- Schema Migrations ---
+# Each migration runs once per database, in its own transaction, in version order.
+# Append new migrations; never edit one that has shipped.
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = []
+
+# Serialises concurrent startups (several uvicorn workers, the job worker pool)
+MIGRATION_LOCK_ID = 7_312_004_001
+
+def migration(version: int, description: str):
+    def register(fn: Callable[[Connection], None]):
+        MIGRATIONS.append((version, description, fn))
+        return fn
+    return register
+
+class MigrationDeferred(Exception):
+    """Raised by a migration that cannot apply yet; it is rolled back, left unrecorded and
+    retried on the next run."""
+
+@migration(1, "Create base tables")
+def create_base_tables(conn: Connection):
+    # The tables as they stood when migrations were introduced; later columns and tables
+    # belong to later migrations, so this never follows the models.
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS blacklist (
+            id SERIAL PRIMARY KEY,
+            blocked INTEGER NOT NULL,
+            original VARCHAR NOT NULL,
+            malicious VARCHAR NOT NULL
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS blacklist_stats (
+            original VARCHAR PRIMARY KEY,
+            total INTEGER NOT NULL,
+            blocked INTEGER NOT NULL
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS resolution_cache (
+            resolver VARCHAR NOT NULL,
+            domain VARCHAR NOT NULL,
+            "exists" BOOLEAN NOT NULL,
+            expires_at TIMESTAMPTZ NOT NULL,
+            PRIMARY KEY (resolver, domain)
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS analysis_job (
+            id SERIAL PRIMARY KEY,
+            domain VARCHAR NOT NULL,
+            status VARCHAR NOT NULL,
+            position INTEGER NOT NULL,
+            hits INTEGER NOT NULL,
+            cancel_requested BOOLEAN NOT NULL,
+            worker VARCHAR,
+            error VARCHAR,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_analysis_job_status ON analysis_job (status)"))
+    conn.execute(text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_analysis_job_active_domain
+        ON analysis_job (domain) WHERE status IN ('pending', 'running')
+    """))
+
+@migration(2, "Maintain blacklist_stats with triggers")
+def blacklist_stats_triggers(conn: Connection):
+    # Statement-level triggers keep blacklist_stats in step with every write to blacklist,
+    # whichever code path (API, worker, bulk import) makes it.
+    conn.execute(text("""
+        CREATE OR REPLACE FUNCTION blacklist_stats_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                INSERT INTO blacklist_stats (original, total, blocked)
+                SELECT original, -count(*), -count(*) FILTER (WHERE blocked = 1) FROM old_rows GROUP BY original
+                ON CONFLICT (original) DO UPDATE
+                SET total = blacklist_stats.total + EXCLUDED.total, blocked = blacklist_stats.blocked + EXCLUDED.blocked;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                INSERT INTO blacklist_stats (original, total, blocked)
+                SELECT original, count(*), count(*) FILTER (WHERE blocked = 1) FROM new_rows GROUP BY original
+                ON CONFLICT (original) DO UPDATE
+                SET total = blacklist_stats.total + EXCLUDED.total, blocked = blacklist_stats.blocked + EXCLUDED.blocked;
+            END IF;
+            DELETE FROM blacklist_stats WHERE total <= 0;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """))
+    for name in ("insert", "update", "delete"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS blacklist_stats_{name} ON blacklist"))
+    conn.execute(text("""
+        CREATE TRIGGER blacklist_stats_insert AFTER INSERT ON blacklist
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION blacklist_stats_apply()
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER blacklist_stats_update AFTER UPDATE ON blacklist
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION blacklist_stats_apply()
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER blacklist_stats_delete AFTER DELETE ON blacklist
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION blacklist_stats_apply()
+    """))
+    conn.execute(text("DELETE FROM blacklist_stats"))
+    conn.execute(text("""
+        INSERT INTO blacklist_stats (original, total, blocked)
+        SELECT original, count(*), count(*) FILTER (WHERE blocked = 1) FROM blacklist GROUP BY original
+    """))
+
+@migration(3, "Deduplicate blacklist and add lookup indexes")
+def blacklist_indexes(conn: Connection):
+    # Keep one row per normalized name, preferring a blocked row, then the oldest
+    conn.execute(text("""
+        DELETE FROM blacklist WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY lower(rtrim(malicious, '.')) ORDER BY blocked DESC, id
+                ) AS rn
+                FROM blacklist
+            ) ranked
+            WHERE rn > 1
+        )
+    """))
+    conn.execute(text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_blacklist_malicious_normalized
+        ON blacklist (lower(rtrim(malicious, '.')))
+    """))
+    # Serves the resolvers' per-query "malicious = ... AND blocked = 1" lookup
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_blacklist_blocked_malicious
+        ON blacklist (malicious) WHERE blocked = 1
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_blacklist_original ON blacklist (original)"))
+
+@migration(4, "Journal blacklist changes for incremental consumers")
+def blacklist_journal(conn: Connection):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS blacklist_journal (
+            seq BIGSERIAL PRIMARY KEY,
+            malicious VARCHAR NOT NULL,
+            changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+    """))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS rpz_build_state (
+            name VARCHAR PRIMARY KEY,
+            seq BIGINT NOT NULL DEFAULT 0,
+            serial BIGINT NOT NULL DEFAULT 0,
+            built_at TIMESTAMPTZ
+        )
+    """))
+    # The advisory lock makes journal writers commit in seq order, so a reader that has
+    # seen seq N can never later find a newly committed entry below N. The cost: every
+    # transaction that writes blacklist is serialised from its first write until commit,
+    # and because the lock is taken after that statement's row locks, two multi-statement
+    # writers touching the same rows in different orders can deadlock (PostgreSQL aborts
+    # one). Writers therefore keep to one statement per transaction (see journal.py).
+    conn.execute(text("""
+        CREATE OR REPLACE FUNCTION blacklist_journal_apply() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtext('blacklist_journal'));
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO blacklist_journal (malicious) SELECT malicious FROM new_rows ORDER BY id;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO blacklist_journal (malicious) SELECT malicious FROM old_rows ORDER BY id;
+            ELSE
+                INSERT INTO blacklist_journal (malicious)
+                SELECT name FROM (
+                    SELECT o.id, o.malicious AS name FROM old_rows o JOIN new_rows n USING (id)
+                    WHERE o.blocked IS DISTINCT FROM n.blocked OR o.malicious IS DISTINCT FROM n.malicious
+                    UNION ALL
+                    SELECT n.id, n.malicious FROM old_rows o JOIN new_rows n USING (id)
+                    WHERE o.malicious IS DISTINCT FROM n.malicious
+                ) changed ORDER BY id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """))
+    for name in ("insert", "update", "delete"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS blacklist_journal_{name} ON blacklist"))
+    conn.execute(text("""
+        CREATE TRIGGER blacklist_journal_insert AFTER INSERT ON blacklist
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION blacklist_journal_apply()
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER blacklist_journal_update AFTER UPDATE ON blacklist
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION blacklist_journal_apply()
+    """))
+    conn.execute(text("""
+        CREATE TRIGGER blacklist_journal_delete AFTER DELETE ON blacklist
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION blacklist_journal_apply()
+    """))
+
+@migration(5, "Record operation and state in the blacklist journal")
+def blacklist_change_log(conn: Connection):
+    conn.execute(text("""
+        ALTER TABLE blacklist_journal
+            ADD COLUMN IF NOT EXISTS op VARCHAR NOT NULL DEFAULT 'add',
+            ADD COLUMN IF NOT EXISTS original VARCHAR,
+            ADD COLUMN IF NOT EXISTS blocked INTEGER
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_blacklist_journal_changed_at ON blacklist_journal (changed_at)"))
+    conn.execute(text("""
+        CREATE OR REPLACE FUNCTION blacklist_journal_apply() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock(hashtext('blacklist_journal'));
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO blacklist_journal (op, malicious, original, blocked)
+                SELECT 'add', malicious, original, blocked FROM new_rows ORDER BY id;
+            ELSIF TG_OP = 'DELETE' THEN
+                INSERT INTO blacklist_journal (op, malicious, original, blocked)
+                SELECT 'remove', malicious, original, NULL FROM old_rows ORDER BY id;
+            ELSE
+                -- A rename is a removal of the old name and an addition of the new one
+                INSERT INTO blacklist_journal (op, malicious, original, blocked)
+                SELECT op, malicious, original, blocked FROM (
+                    SELECT o.id, 0 AS step, 'remove' AS op, o.malicious, o.original, NULL::INTEGER AS blocked
+                    FROM old_rows o JOIN new_rows n USING (id)
+                    WHERE o.malicious IS DISTINCT FROM n.malicious
+                    UNION ALL
+                    SELECT n.id, 1, 'add', n.malicious, n.original, n.blocked
+                    FROM old_rows o JOIN new_rows n USING (id)
+                    WHERE o.malicious IS DISTINCT FROM n.malicious
+                    UNION ALL
+                    SELECT n.id, 1, 'toggle', n.malicious, n.original, n.blocked
+                    FROM old_rows o JOIN new_rows n USING (id)
+                    WHERE o.malicious IS NOT DISTINCT FROM n.malicious AND o.blocked IS DISTINCT FROM n.blocked
+                ) changed ORDER BY id, step;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """))
+
+@migration(6, "Notify listeners of blacklist changes")
+def blacklist_change_notify(conn: Connection):
+    # Delivered at commit; the payload is the highest seq the statement journalled
+    conn.execute(text("""
+        CREATE OR REPLACE FUNCTION blacklist_journal_notify() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('blacklist_changes', max(seq)::text) FROM new_entries HAVING count(*) > 0;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """))
+    conn.execute(text("DROP TRIGGER IF EXISTS blacklist_journal_notify ON blacklist_journal"))
+    conn.execute(text("""
+        CREATE TRIGGER blacklist_journal_notify AFTER INSERT ON blacklist_journal
+        REFERENCING NEW TABLE AS new_entries FOR EACH STATEMENT EXECUTE FUNCTION blacklist_journal_notify()
+    """))
+
+@migration(7, "Index blacklist names for substring search")
+def blacklist_search_index(conn: Connection):
+    # pg_trgm is a trusted extension (PostgreSQL 13+); until it can be installed search
+    # falls back to a scan and this migration is retried on every run
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except Exception as e:
+        raise MigrationDeferred(f"pg_trgm unavailable, blacklist search will not be indexed: {e}")
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_blacklist_malicious_trgm
+        ON blacklist USING gin (malicious gin_trgm_ops)
+    """))
+
+@migration(8, "Store login sessions")
+def user_sessions(conn: Connection):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS user_sessions (
+            id VARCHAR PRIMARY KEY,
+            user_id VARCHAR NOT NULL,
+            db_key VARCHAR,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+            expires_at TIMESTAMPTZ NOT NULL
+        )
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_user_sessions_expires_at ON user_sessions (expires_at)"))
+
+@migration(9, "Store blacklist names in canonical form")
+def canonical_blacklist_names(conn: Connection):
+    # Earlier write paths stored Unicode, "\DDD"-escaped and mixed-case spellings. Names the
+    # codec rejects are left as they are; an original is only a name when it ends in a dot.
+    changes, invalid = [], 0
+    result = conn.execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE).execute(
+        text("SELECT id, original, malicious FROM blacklist")
+    )
+    for rows in result.partitions():
+        names, rejected = canonical_names([row.malicious for row in rows])
+        originals, _ = canonical_names([row.original if row.original.endswith('.') else "" for row in rows])
+        invalid += rejected
+        for row, name, original in zip(rows, names, originals):
+            name, original = name or row.malicious, original or row.original
+            if name != row.malicious or original != row.original:
+                changes.append({"id": row.id, "malicious": name, "original": original})
+    if invalid:
+        print(f"{invalid} blacklist names are not valid domain names and were left unchanged")
+    if not changes:
+        return
+
+    conn.execute(text("""
+        CREATE TEMP TABLE canonical_blacklist (id INTEGER PRIMARY KEY, malicious VARCHAR NOT NULL, original VARCHAR NOT NULL)
+        ON COMMIT DROP
+    """))
+    conn.execute(text("INSERT INTO canonical_blacklist VALUES (:id, :malicious, :original)"), changes)
+    # Two writes to blacklist follow; take the journal triggers' lock before either
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('blacklist_journal'))"))
+    # Spellings of one name collapse to one row, preferring a blocked row, then the oldest
+    deleted = conn.execute(text("""
+        DELETE FROM blacklist WHERE id IN (
+            SELECT id FROM (
+                SELECT b.id, row_number() OVER (
+                    PARTITION BY lower(rtrim(coalesce(c.malicious, b.malicious), '.')) ORDER BY b.blocked DESC, b.id
+                ) AS rn
+                FROM blacklist b LEFT JOIN canonical_blacklist c USING (id)
+            ) ranked
+            WHERE rn > 1
+        )
+    """)).rowcount
+    updated = conn.execute(text("""
+        UPDATE blacklist b SET malicious = c.malicious, original = c.original
+        FROM canonical_blacklist c WHERE b.id = c.id
+    """)).rowcount
+    print(f"Canonicalized {updated} blacklist names, removed {deleted} duplicate spellings")
+
+@migration(10, "Record resolution cache usage per analysis job")
+def analysis_job_cache_counters(conn: Connection):
+    # Verification runs in the job workers, so their cache counters are kept with the job
+    conn.execute(text("""
+        ALTER TABLE analysis_job
+            ADD COLUMN IF NOT EXISTS cache_hits INTEGER NOT NULL DEFAULT 0,
+            ADD COLUMN IF NOT EXISTS cache_misses INTEGER NOT NULL DEFAULT 0
+    """))
+
+def run_migrations(engine) -> int:
+    """Applies pending migrations and returns the highest version recorded as applied."""
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+        """))
+
+    for version, description, apply in sorted(MIGRATIONS, key=lambda m: m[0]):
+        try:
+            with engine.begin() as conn:
+                conn.execute(text("SELECT pg_advisory_xact_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+                applied = conn.execute(
+                    text("SELECT 1 FROM schema_migrations WHERE version = :version"), {"version": version}
+                ).first()
+                if applied:
+                    continue
+                print(f"Applying migration {version}: {description}")
+                apply(conn)
+                conn.execute(
+                    text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+                    {"version": version, "description": description},
+                )
+        except MigrationDeferred as e:
+            print(f"Migration {version} deferred: {e}")
+
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT coalesce(max(version), 0) FROM schema_migrations")).scalar()
+
+if __name__ == "__main__":
+    # python -m app.migrations [db_key ...]
+    for db_key in sys.argv[1:] or list(db_manager.databases):
+        print(f"{db_key}: schema version {run_migrations(db_manager.get_engine(db_key))}")
@@ -0,0 +1,124 @@
+import asyncio
+import select
+import threading
+from typing import Dict, Optional, Set
+import psycopg2
+import psycopg2.extensions
+from .config import LISTEN_RECONNECT_DELAY
+from .database import db_manager
+
+CHANNEL = "blacklist_changes"
+
+# --- Subscriptions ---
+class ChangeSubscription:
+    """Wakes one asyncio consumer when the journal moves; notifications in between collapse into one."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.event = asyncio.Event()
+        self.seq = 0
+
+    def _wake(self, seq: int):
+        self.seq = max(self.seq, seq)
+        self.event.set()
+
+    async def wait(self, timeout: Optional[float] = None) -> bool:
+        """True once a change arrived, False on timeout."""
+        try:
+            await asyncio.wait_for(self.event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self.event.clear()
+        return True
+
+# --- Listener ---
+class ChangeBroker:
+    """
+    Holds one dedicated LISTEN connection to a database (outside the pool) in a thread,
+    and fans each blacklist_changes notification out to the subscribed event loops.
+    """
+
+    def __init__(self, db_key: str):
+        self.db_key = db_key
+        self.seq = 0
+        self._subscribers: Set[ChangeSubscription] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self) -> ChangeSubscription:
+        subscription = ChangeSubscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ChangeSubscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"listen-{self.db_key}", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=LISTEN_RECONNECT_DELAY + 1)
+
+    def _publish(self, seq: int):
+        self.seq = max(self.seq, seq)
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription._wake, seq)
+            except RuntimeError:
+                # Loop already closed
+                self.unsubscribe(subscription)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                print(f"LISTEN {CHANNEL} on {self.db_key} failed: {e}")
+            self._stop.wait(LISTEN_RECONNECT_DELAY)
+
+    def _listen(self):
+        conn = psycopg2.connect(db_manager.get_url(self.db_key))
+        try:
+            conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+            # Notifications sent while we were disconnected are lost: wake everyone to re-read the journal
+            self._publish(self.seq)
+            while not self._stop.is_set():
+                if select.select([conn], [], [], 1.0) == ([], [], []):
+                    continue
+                conn.poll()
+                seq = None
+                while conn.notifies:
+                    payload = conn.notifies.pop(0).payload
+                    seq = max(seq or 0, int(payload) if payload.isdigit() else 0)
+                if seq is not None:
+                    self._publish(seq)
+        finally:
+            conn.close()
+
+change_brokers: Dict[str, ChangeBroker] = {}
+
+def broker_for(db_key: Optional[str] = None) -> ChangeBroker:
+    key = db_key or db_manager.selected()
+    if key not in change_brokers:
+        change_brokers[key] = ChangeBroker(key)
+    return change_brokers[key]
+
+def start_brokers():
+    for db_key in db_manager.databases:
+        broker_for(db_key).start()
+
+def stop_brokers():
+    for broker in change_brokers.values():
+        broker.stop()
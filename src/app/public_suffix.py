@@ -0,0 +1,100 @@
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from .config import PUBLIC_SUFFIX_LIST, PUBLIC_SUFFIX_PRIVATE, PUBLIC_SUFFIX_CACHE_SIZE
+
+# --- Suffix Trie ---
+class PublicSuffixList:
+    """
+    Public suffix rules as a trie over reversed labels (in -> co). One walk from the TLD
+    finds the longest matching rule, honouring "*." wildcards and "!" exceptions.
+    """
+
+    # Keys marking a node that ends a rule; never valid labels
+    RULE = ""
+    EXCEPTION = "!"
+    WILDCARD = "*"
+
+    def __init__(self, rules: Iterable[str] = ()):
+        self.root: Dict[str, dict] = {}
+        self.count = 0
+        for rule in rules:
+            self.add(rule)
+
+    @classmethod
+    def load(cls, path: str = PUBLIC_SUFFIX_LIST, private: bool = PUBLIC_SUFFIX_PRIVATE) -> "PublicSuffixList":
+        with open(path, encoding="utf-8") as f:
+            return cls(cls.parse(f, private))
+
+    @staticmethod
+    def parse(lines: Iterable[str], private: bool = False) -> Iterable[str]:
+        for line in lines:
+            line = line.strip()
+            if not private and line.startswith("// ===BEGIN PRIVATE DOMAINS==="):
+                return
+            if not line or line.startswith("//"):
+                continue
+            rule = line.split()[0].lower()
+            if not rule.isascii():
+                # Internationalized rules are matched in their Punycode form
+                rule = '.'.join(label if label in "*!" or label.isascii() else label.encode('idna').decode('ascii')
+                                for label in rule.split('.'))
+            yield rule
+
+    def add(self, rule: str):
+        marker = self.RULE
+        if rule.startswith(self.EXCEPTION):
+            marker, rule = self.EXCEPTION, rule[1:]
+        node = self.root
+        for label in reversed(rule.split('.')):
+            node = node.setdefault(label, {})
+        if self.RULE not in node and self.EXCEPTION not in node:
+            self.count += 1
+        node[marker] = {}
+
+    def suffix_length(self, labels: List[str]) -> int:
+        """How many trailing labels form the public suffix (an unlisted TLD is a suffix by itself)."""
+        length, node = 1, self.root
+        for depth in range(1, len(labels) + 1):
+            child = node.get(labels[-depth])
+            if child is not None and self.EXCEPTION in child:
+                return depth - 1
+            if (child is not None and self.RULE in child) or self.RULE in node.get(self.WILDCARD, {}):
+                length = depth
+            if child is None:
+                break
+            node = child
+        return length
+
+# Loaded once per process
+public_suffixes = PublicSuffixList.load()
+
+# --- Registrable Domains ---
+@lru_cache(maxsize=PUBLIC_SUFFIX_CACHE_SIZE)
+def split_domain(name: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    "www.brand.co.in" -> ("brand", "co.in") for an ASCII (Punycode) name. A "*." prefix is
+    ignored; a bare public suffix or a malformed name gives (None, None).
+    """
+    labels = name.strip().rstrip('.').lower().split('.')
+    if labels[0] == PublicSuffixList.WILDCARD:
+        labels = labels[1:]
+    if not labels or not all(labels):
+        return None, None
+    length = public_suffixes.suffix_length(labels)
+    if len(labels) <= length:
+        return None, None
+    return labels[-length - 1], '.'.join(labels[-length:])
+
+def registrable_domain(name: str) -> Optional[str]:
+    label, suffix = split_domain(name)
+    return f"{label}.{suffix}" if label else None
+
+def registrable_domains(names: Iterable[str]) -> List[Optional[str]]:
+    """registrable_domain for a batch; repeats within the batch skip the shared LRU."""
+    seen: Dict[str, Optional[str]] = {}
+    results = []
+    for name in names:
+        if name not in seen:
+            seen[name] = registrable_domain(name)
+        results.append(seen[name])
+    return results
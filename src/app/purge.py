@@ -0,0 +1,240 @@
+import asyncio
+import base64
+import os
+import socket
+import struct
+from typing import Dict, List, Optional, Tuple
+import nacl.secret
+import nacl.utils
+import requests
+from .config import PURGE_TARGETS, PURGE_INTERVAL, PURGE_BATCH, PURGE_TIMEOUT, RPZ_JOURNAL_BATCH
+from .database import db_manager
+from .journal import journal_position, read_journal, compacted_past
+from .notify import broker_for
+from .codec import WILDCARD_PREFIX
+from .rpz import render_owner, resolver_db_key
+from .unbound_control import UnboundControl
+
+# A purge is (name with trailing dot, whole subtree?): wildcard rules purge everything below
+# their suffix, exact entries just the name
+Purge = Tuple[str, bool]
+
+def purge_of(malicious: str) -> Optional[Purge]:
+    owner = render_owner(malicious)
+    if not owner:
+        return None
+    if owner.startswith(WILDCARD_PREFIX):
+        return owner[len(WILDCARD_PREFIX):] + '.', True
+    return owner + '.', False
+
+def _lua_string(value: str) -> str:
+    # Names are ASCII owner names; quote for Lua anyway
+    return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+# --- Resolver Purgers ---
+class PowerDNSPurger:
+    """PowerDNS Recursor API: PUT /cache/flush per name over one keep-alive connection."""
+
+    def __init__(self, url: str, api_key: Optional[str]):
+        self.url = url.rstrip('/') + "/api/v1/servers/localhost/cache/flush"
+        self.api_key = api_key
+        self.http = requests.Session()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.api_key)
+
+    def purge(self, purges: List[Purge]):
+        for name, subtree in purges:
+            response = self.http.put(
+                self.url,
+                params={"domain": name, "subtree": "true" if subtree else "false"},
+                headers={"X-API-Key": self.api_key},
+                timeout=PURGE_TIMEOUT,
+            )
+            response.raise_for_status()
+
+class DnsdistPurger:
+    """
+    dnsdist console (controlSocket + setKey): nonce exchange, then NaCl secretbox
+    messages framed by a 32-bit length. The whole batch is one Lua command.
+    """
+
+    NONCE_SIZE = nacl.secret.SecretBox.NONCE_SIZE
+
+    def __init__(self, host: str, port: int, key: Optional[str]):
+        self.address = (host, port)
+        self.box = nacl.secret.SecretBox(base64.b64decode(key)) if key else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.box is not None
+
+    @staticmethod
+    def _merge(lower: bytes, higher: bytes) -> bytearray:
+        half = len(lower) // 2
+        return bytearray(lower[:half] + higher[half:])
+
+    @staticmethod
+    def _increment(nonce: bytearray):
+        counter = (struct.unpack_from(">I", nonce)[0] + 1) & 0xFFFFFFFF
+        struct.pack_into(">I", nonce, 0, counter)
+
+    @staticmethod
+    def _read_exactly(sock: socket.socket, size: int) -> bytes:
+        data = b""
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("dnsdist console closed the connection")
+            data += chunk
+        return data
+
+    def command(self, line: str) -> str:
+        with socket.create_connection(self.address, timeout=PURGE_TIMEOUT) as sock:
+            ours = nacl.utils.random(self.NONCE_SIZE)
+            sock.sendall(ours)
+            theirs = self._read_exactly(sock, self.NONCE_SIZE)
+            reading, writing = self._merge(ours, theirs), self._merge(theirs, ours)
+
+            message = self.box.encrypt(line.encode(), bytes(writing)).ciphertext
+            sock.sendall(struct.pack(">I", len(message)) + message)
+            self._increment(writing)
+
+            length = struct.unpack(">I", self._read_exactly(sock, 4))[0]
+            reply = self.box.decrypt(self._read_exactly(sock, length), bytes(reading))
+            self._increment(reading)
+            return reply.decode(errors="replace")
+
+    def purge(self, purges: List[Purge]):
+        statements = [
+            f"cache:expungeByName(newDNSName({_lua_string(name)}), DNSQType.ANY, {'true' if subtree else 'false'})"
+            for name, subtree in purges
+        ]
+        self.command('local cache = getPool(""):getCache(); if cache then ' + "; ".join(statements) + " end")
+
+class UnboundPurger:
+    """flush / flush_zone per name through the shared unbound-control client."""
+
+    def __init__(self, socket: str):
+        self.control = UnboundControl(socket)
+
+    @property
+    def enabled(self) -> bool:
+        return self.control.available
+
+    def purge(self, purges: List[Purge]):
+        for name, subtree in purges:
+            self.control.command(f"{'flush_zone' if subtree else 'flush'} {name}")
+
+class KresdPurger:
+    """kresd control socket in binary mode: one cache.clear() per name, replies length-prefixed."""
+
+    def __init__(self, socket: str):
+        self.path = socket
+
+    @property
+    def enabled(self) -> bool:
+        return os.path.exists(self.path)
+
+    def purge(self, purges: List[Purge]):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(PURGE_TIMEOUT)
+            sock.connect(self.path)
+            sock.sendall(b"__binary\n")
+            for name, subtree in purges:
+                # exact_name=false clears the whole subtree
+                sock.sendall(f"cache.clear({_lua_string(name)}, {'false' if subtree else 'true'})\n".encode())
+                length = struct.unpack(">I", DnsdistPurger._read_exactly(sock, 4))[0]
+                DnsdistPurger._read_exactly(sock, length)
+
+PURGERS = {
+    "powerdns": PowerDNSPurger,
+    "dnsdist": DnsdistPurger,
+    "unbound": UnboundPurger,
+    "kresd": KresdPurger,
+}
+
+def configured_purgers() -> Dict[str, object]:
+    return {
+        name: PURGERS[options["kind"]](**{key: value for key, value in options.items() if key != "kind"})
+        for name, options in PURGE_TARGETS.items()
+    }
+
+# --- Purge Fan-out ---
+class CachePurgeQueue:
+    """
+    Follows the blacklist journal of the resolvers' database and purges every changed
+    name from each resolver's cache. Names changed within PURGE_INTERVAL are
+    deduplicated and sent in batches of PURGE_BATCH.
+    """
+
+    def __init__(self, db_key: Optional[str] = None, purgers: Optional[Dict[str, object]] = None):
+        self.db_key = db_key
+        self.purgers = purgers if purgers is not None else configured_purgers()
+        self.seq: Optional[int] = None
+        self.purged = 0
+        self.failures: Dict[str, int] = {name: 0 for name in self.purgers}
+
+    def _engine(self):
+        return db_manager.get_engine(self.db_key or resolver_db_key())
+
+    def collect(self) -> List[Purge]:
+        """Names changed since the last call, deduplicated."""
+        with self._engine().connect() as conn:
+            if self.seq is None or compacted_past(conn, self.seq):
+                # Nothing before now can still be in a cache because of us
+                self.seq = journal_position(conn)
+                return []
+            changed = set()
+            while True:
+                self.seq, names = read_journal(conn, self.seq, RPZ_JOURNAL_BATCH)
+                if not names:
+                    break
+                changed |= names
+        return sorted(filter(None, map(purge_of, changed)))
+
+    def purge(self, purges: List[Purge]):
+        for start in range(0, len(purges), PURGE_BATCH):
+            batch = purges[start:start + PURGE_BATCH]
+            for name, purger in self.purgers.items():
+                if not purger.enabled:
+                    continue
+                try:
+                    purger.purge(batch)
+                except Exception as e:
+                    self.failures[name] += 1
+                    print(f"Cache purge on {name} failed: {e}")
+            self.purged += len(batch)
+
+    def run_once(self) -> int:
+        purges = self.collect()
+        if purges:
+            self.purge(purges)
+        return len(purges)
+
+    async def follow(self):
+        broker = broker_for(self.db_key or resolver_db_key())
+        subscription = broker.subscribe()
+        try:
+            await asyncio.to_thread(self.run_once)
+            while True:
+                if await subscription.wait():
+                    # Let the rest of a burst arrive, then purge it as one batch
+                    await asyncio.sleep(PURGE_INTERVAL)
+                    try:
+                        await asyncio.to_thread(self.run_once)
+                    except Exception as e:
+                        print(f"Cache purge failed: {e}")
+        finally:
+            broker.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "seq": self.seq,
+            "purged": self.purged,
+            "failures": self.failures,
+            "targets": {name: purger.enabled for name, purger in self.purgers.items()},
+        }
+
+cache_purge_queue = CachePurgeQueue()
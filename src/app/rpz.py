@@ -0,0 +1,237 @@
+import argparse
+import os
+import subprocess
+import time
+import zlib
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlmodel import select
+from .codec import LABEL
+from .config import RPZ_TARGETS, RPZ_SHARDS, RPZ_TTL, RPZ_RELOAD_TIMEOUT, RPZ_JOURNAL_BATCH, RESOLVER_DB_KEY, EXPORT_FETCH_SIZE
+from .database import Blacklist, db_manager
+from .journal import journal_position, read_journal, blocked_among, compacted_past
+from .unbound_control import UnboundControl
+
+# Only one process builds the zone files at a time
+RPZ_LOCK_ID = 7_312_004_012
+STATE_NAME = "rpz"
+
+# --- Zone Rendering ---
+def valid_owner(owner: str) -> bool:
+    labels = owner.split('.')
+    if labels[0] == '*':
+        labels = labels[1:]
+    return bool(labels) and all(LABEL.fullmatch(label) for label in labels)
+
+def render_owner(name: str) -> Optional[str]:
+    """
+    Stored blacklist name -> lower-case ASCII owner name without the trailing dot, or None
+    when it is not a name that can be written out safely.
+    """
+    name = name.strip().rstrip('.').lower()
+    if not name:
+        return None
+    if not name.isascii():
+        try:
+            name = name.encode('idna').decode('ascii')
+        except UnicodeError:
+            return None
+    return name if valid_owner(name) else None
+
+def skipped_names(names: Iterable[str]) -> List[str]:
+    return [name for name in names if render_owner(name) is None]
+
+def log_skipped(skipped: List[str]):
+    if skipped:
+        sample = ", ".join(repr(name) for name in skipped[:5])
+        print(f"Skipped {len(skipped)} blacklist names that are not valid owner names: {sample}")
+
+def shard_of(owner: str, shards: int = RPZ_SHARDS) -> int:
+    return zlib.crc32(owner.encode()) % shards
+
+def atomic_write(path: Path, lines: Iterable[str]):
+    """Writes a temp file next to `path` and renames it over, so readers never see a partial file."""
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        f.writelines(lines)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+class ZoneTarget:
+    """One resolver's RPZ zone: a small main file that $INCLUDEs RPZ_SHARDS shard files."""
+
+    def __init__(self, name: str, directory: str, filename: str, include_dir: str,
+                 shards: int = RPZ_SHARDS, reload: Optional[List[str]] = None,
+                 control_socket: Optional[str] = None, zone: Optional[str] = None):
+        self.name = name
+        self.reload_command = reload
+        # Unbound: the zone is reloaded with auth_zone_reload over this control socket
+        self.control_socket = control_socket
+        self.zone = zone
+        self.directory = Path(directory)
+        self.main_path = self.directory / filename
+        self.shard_dir = self.directory / "shards"
+        self.include_dir = include_dir
+        self.shards = shards
+
+    def shard_path(self, shard: int) -> Path:
+        return self.shard_dir / f"shard-{shard:03d}.rpz"
+
+    def include_path(self, shard: int) -> str:
+        return f"{self.include_dir}/shard-{shard:03d}.rpz"
+
+    def is_complete(self) -> bool:
+        return self.main_path.exists() and all(self.shard_path(i).exists() for i in range(self.shards))
+
+    def render_entry(self, owner: str) -> str:
+        # CNAME . is the RPZ NXDOMAIN action; "*.name" is a native RPZ wildcard, which
+        # covers the names below "name" but not "name" itself
+        return f"{owner} CNAME .\n"
+
+    def parse_entry(self, line: str) -> Optional[str]:
+        line = line.strip()
+        return line.split()[0] if line and not line.startswith(';') else None
+
+    def read_shard(self, shard: int) -> Set[str]:
+        with open(self.shard_path(shard)) as f:
+            return {owner for owner in map(self.parse_entry, f) if owner}
+
+    def write_shard(self, shard: int, owners: Iterable[str]):
+        atomic_write(self.shard_path(shard), (self.render_entry(owner) for owner in sorted(owners)))
+
+    def reload(self):
+        """Tells a resolver that does not watch its files (BIND, Unbound) to load the new serial."""
+        if self.control_socket:
+            control = UnboundControl(self.control_socket)
+            if not control.available:
+                return
+            try:
+                control.command(f"auth_zone_reload {self.zone}")
+            except (OSError, RuntimeError) as e:
+                print(f"Reloading {self.name} failed: {e}")
+        if not self.reload_command:
+            return
+        try:
+            subprocess.run(self.reload_command, check=True, capture_output=True, text=True,
+                           timeout=RPZ_RELOAD_TIMEOUT)
+        except (OSError, subprocess.SubprocessError) as e:
+            detail = getattr(e, "stderr", None) or e
+            print(f"Reloading {self.name} failed: {str(detail).strip()}")
+
+    def write_main(self, serial: int):
+        header = [
+            f"$TTL {RPZ_TTL}\n",
+            f"@ IN SOA localhost. root.localhost. ({serial} 3600 1800 604800 {RPZ_TTL})\n",
+            "  IN NS localhost.\n",
+            "; Generated by the manager - do not edit\n",
+        ]
+        includes = [f"$INCLUDE {self.include_path(i)}\n" for i in range(self.shards)]
+        atomic_write(self.main_path, header + includes)
+
+def configured_targets() -> List[ZoneTarget]:
+    return [ZoneTarget(name, **options) for name, options in RPZ_TARGETS.items()]
+
+def resolver_db_key() -> str:
+    return RESOLVER_DB_KEY or next(iter(db_manager.databases))
+
+# --- Compiler ---
+class RpzCompiler:
+    """
+    Renders the blocked = 1 set into every target. A full build streams the table once;
+    afterwards each build applies only the blacklist_journal entries written since the
+    previous one and rewrites just the shards those names hash to.
+    """
+
+    def __init__(self, engine, targets: Optional[List[ZoneTarget]] = None):
+        self.engine = engine
+        self.targets = targets if targets is not None else configured_targets()
+
+    def build(self, full: bool = False) -> dict:
+        with self.engine.begin() as conn:
+            if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": RPZ_LOCK_ID}).scalar():
+                return {"status": "busy"}
+            state = conn.execute(
+                text("SELECT seq, serial FROM rpz_build_state WHERE name = :name"), {"name": STATE_NAME}
+            ).first()
+            if (full or state is None or compacted_past(conn, state.seq)
+                    or not all(target.is_complete() for target in self.targets)):
+                seq = self._full_build(conn)
+                shards_written = RPZ_SHARDS
+                serial = state.serial if state else 0
+            else:
+                seq, shards_written = self._incremental_build(conn, state.seq)
+                serial = state.serial
+                if shards_written == 0:
+                    if seq != state.seq:
+                        self._save_state(conn, seq, serial)
+                    return {"status": "unchanged", "seq": seq, "serial": serial}
+
+            serial = max(serial + 1, int(time.time()))
+            for target in self.targets:
+                target.write_main(serial)
+            self._save_state(conn, seq, serial)
+        for target in self.targets:
+            target.reload()
+        return {"status": "built", "seq": seq, "serial": serial, "shards_written": shards_written}
+
+    def _save_state(self, conn: Connection, seq: int, serial: int):
+        conn.execute(text("""
+            INSERT INTO rpz_build_state (name, seq, serial, built_at) VALUES (:name, :seq, :serial, :built_at)
+            ON CONFLICT (name) DO UPDATE SET seq = EXCLUDED.seq, serial = EXCLUDED.serial, built_at = EXCLUDED.built_at
+        """), {"name": STATE_NAME, "seq": seq, "serial": serial, "built_at": datetime.now(timezone.utc)})
+
+    def _full_build(self, conn: Connection) -> int:
+        # Read the journal position first: anything committed after it is re-applied next time
+        seq = journal_position(conn)
+        shards: List[Set[str]] = [set() for _ in range(RPZ_SHARDS)]
+        result = conn.execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE).execute(
+            select(Blacklist.malicious).where(Blacklist.blocked == 1)
+        )
+        skipped = []
+        for malicious in result.scalars():
+            owner = render_owner(malicious)
+            if owner:
+                shards[shard_of(owner)].add(owner)
+            else:
+                skipped.append(malicious)
+        log_skipped(skipped)
+
+        for target in self.targets:
+            target.shard_dir.mkdir(parents=True, exist_ok=True)
+            for shard, owners in enumerate(shards):
+                target.write_shard(shard, owners)
+        return seq
+
+    def _incremental_build(self, conn: Connection, seq: int):
+        shards_written = 0
+        while True:
+            seq, names = read_journal(conn, seq, RPZ_JOURNAL_BATCH)
+            if not names:
+                return seq, shards_written
+            blocked = {owner for owner in map(render_owner, blocked_among(conn, names)) if owner}
+            log_skipped(skipped_names(names))
+
+            changes: Dict[int, Set[str]] = {}
+            for owner in filter(None, map(render_owner, names)):
+                changes.setdefault(shard_of(owner), set()).add(owner)
+
+            for shard, owners in changes.items():
+                for target in self.targets:
+                    current = target.read_shard(shard)
+                    updated = (current - owners) | (owners & blocked)
+                    if updated != current:
+                        target.write_shard(shard, updated)
+                        shards_written += 1
+
+def compile_resolver_zones(full: bool = False) -> dict:
+    return RpzCompiler(db_manager.get_engine(resolver_db_key())).build(full=full)
+
+if __name__ == "__main__":
+    # python -m app.rpz [--full]
+    parser = argparse.ArgumentParser(description="Compile the blocklist into resolver zone files")
+    parser.add_argument("--full", action="store_true", help="rebuild every shard from the blacklist table")
+    print(compile_resolver_zones(full=parser.parse_args().full))
@@ -0,0 +1,155 @@
+import secrets
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, NamedTuple, Optional, Tuple
+from sqlalchemy import text
+from .config import SESSION_STORE, SESSION_DB_KEY, SESSION_TTL, SESSION_CACHE_TTL, SESSION_CACHE_SIZE
+from .database import db_manager
+
+class SessionData(NamedTuple):
+    user_id: str
+    # Database the session works on; None means the default
+    db_key: Optional[str]
+    expires_at: float
+
+# --- Session Stores ---
+class SessionStore(ABC):
+    """Login sessions keyed by an opaque random id, expiring SESSION_TTL after login."""
+
+    @abstractmethod
+    async def create(self, user_id: str) -> str: ...
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Optional[SessionData]: ...
+
+    @abstractmethod
+    async def set_db(self, session_id: str, db_key: str): ...
+
+    @abstractmethod
+    async def delete(self, session_id: str): ...
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """Drops expired sessions; returns how many."""
+
+class MemorySessionStore(SessionStore):
+    """Process-local store: only for a single worker."""
+
+    def __init__(self):
+        self._sessions: Dict[str, SessionData] = {}
+        self._lock = threading.Lock()
+
+    async def create(self, user_id: str) -> str:
+        session_id = secrets.token_urlsafe(32)
+        with self._lock:
+            self._sessions[session_id] = SessionData(user_id, None, time.time() + SESSION_TTL)
+        return session_id
+
+    async def get(self, session_id: str) -> Optional[SessionData]:
+        session = self._sessions.get(session_id)
+        return session if session is not None and session.expires_at > time.time() else None
+
+    async def set_db(self, session_id: str, db_key: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._sessions[session_id] = self._sessions[session_id]._replace(db_key=db_key)
+
+    async def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [key for key, session in self._sessions.items() if session.expires_at <= now]
+            for key in expired:
+                del self._sessions[key]
+        return len(expired)
+
+class PostgresSessionStore(SessionStore):
+    """
+    Sessions in the user_sessions table, shared by every worker and host. Sessions found
+    are cached in-process for SESSION_CACHE_TTL in an LRU of SESSION_CACHE_SIZE, so most
+    requests never reach the database. Misses are not cached: arbitrary cookie values
+    must not be able to grow the cache.
+    """
+
+    def __init__(self, db_key: Optional[str] = None):
+        self.db_key = db_key
+        self._cache: "OrderedDict[str, Tuple[SessionData, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self) -> str:
+        return self.db_key or SESSION_DB_KEY or next(iter(db_manager.databases))
+
+    def _remember(self, session_id: str, session: SessionData):
+        with self._lock:
+            self._cache[session_id] = (session, time.time() + SESSION_CACHE_TTL)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > SESSION_CACHE_SIZE:
+                self._cache.popitem(last=False)
+
+    async def create(self, user_id: str) -> str:
+        session_id = secrets.token_urlsafe(32)
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=SESSION_TTL)
+        async with db_manager.get_async_engine(self._key()).begin() as conn:
+            await conn.execute(
+                text("INSERT INTO user_sessions (id, user_id, expires_at) VALUES (:id, :user_id, :expires_at)"),
+                {"id": session_id, "user_id": user_id, "expires_at": expires_at},
+            )
+        self._remember(session_id, SessionData(user_id, None, expires_at.timestamp()))
+        return session_id
+
+    async def get(self, session_id: str) -> Optional[SessionData]:
+        now = time.time()
+        with self._lock:
+            cached = self._cache.get(session_id)
+            if cached is not None:
+                self._cache.move_to_end(session_id)
+        if cached is not None and cached[1] > now:
+            session = cached[0]
+            return session if session.expires_at > now else None
+
+        async with db_manager.get_async_engine(self._key()).connect() as conn:
+            row = (await conn.execute(
+                text("SELECT user_id, db_key, expires_at FROM user_sessions WHERE id = :id AND expires_at > now()"),
+                {"id": session_id},
+            )).first()
+        if row is None:
+            return None
+        session = SessionData(row.user_id, row.db_key, row.expires_at.timestamp())
+        self._remember(session_id, session)
+        return session
+
+    async def set_db(self, session_id: str, db_key: str):
+        async with db_manager.get_async_engine(self._key()).begin() as conn:
+            await conn.execute(
+                text("UPDATE user_sessions SET db_key = :db_key WHERE id = :id"), {"id": session_id, "db_key": db_key}
+            )
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    async def delete(self, session_id: str):
+        async with db_manager.get_async_engine(self._key()).begin() as conn:
+            await conn.execute(text("DELETE FROM user_sessions WHERE id = :id"), {"id": session_id})
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    def sweep(self) -> int:
+        now = time.time()
+        with self._lock:
+            self._cache = OrderedDict((key, entry) for key, entry in self._cache.items() if entry[1] > now)
+        with db_manager.get_engine(self._key()).begin() as conn:
+            return conn.execute(text("DELETE FROM user_sessions WHERE expires_at <= now()")).rowcount
+
+def make_session_store(kind: str = SESSION_STORE) -> SessionStore:
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "postgres":
+        return PostgresSessionStore()
+    raise ValueError(f"Unknown session store: {kind}")
+
+session_store = make_session_store()
@@ -0,0 +1,22 @@
+from typing import Dict
+from sqlmodel import Session, select, func
+from .config import STATS_COUNTER_TABLE
+from .database import Blacklist, BlacklistStats
+
+# --- Blacklist Statistics ---
+def _entry(total: int, blocked: int) -> dict:
+    return {"total": total, "blocked": blocked, "unblocked": total - blocked}
+
+def aggregate_stats(session: Session) -> Dict[str, dict]:
+    """Per-original totals with blocked/unblocked breakdown, in a single query."""
+    if STATS_COUNTER_TABLE:
+        rows = session.exec(select(BlacklistStats.original, BlacklistStats.total, BlacklistStats.blocked)).all()
+    else:
+        rows = session.exec(
+            select(
+                Blacklist.original,
+                func.count(),
+                func.count().filter(Blacklist.blocked == 1),
+            ).group_by(Blacklist.original)
+        ).all()
+    return {original: _entry(total, blocked) for original, total, blocked in rows}
@@ -1,11 +1,14 @@
-from nicegui import ui
+import asyncio
+from typing import Callable, Dict, Optional
+from nicegui import Client, app as nicegui_app, background_tasks, ui
 from fastapi import FastAPI, Request
-from .api import get_all_blacklist, create_blacklist, get_stats_blacklist, update_blacklist, delete_blacklist, blacklist_queue
+from .api import get_all_blacklist, get_blacklist_page, create_blacklist, get_stats_blacklist, update_blacklist, delete_blacklist, blacklist_queue, get_job
 from .database import Blacklist, get_session, ValidDomain, BlacklistUpdate, DatabaseManager, db_manager
-from .lookalike import worker
-from .auth import is_authenticated, create_session, delete_session, init_admin_password, verify_password
-from sqlmodel import Session, SQLModel, select
-import threading
+from .notify import broker_for
+from .config import CHANGES_KEEPALIVE, UI_REFRESH_INTERVAL, UI_PAGE_SIZE, SESSION_TTL
+from .auth import is_authenticated, create_session, delete_session, check_admin_password, get_login_session
+from .sessions import session_store
+from sqlmodel import SQLModel, select
 
 def setup_ui(app: FastAPI):
     # Custom CSS for modern styling
@@ -46,17 +49,15 @@ def setup_ui(app: FastAPI):
     # --- UI Components ---
     @ui.page('/login')
     async def login(request: Request):
-        if is_authenticated(request):
+        if await is_authenticated(request):
             ui.navigate.to('/')
             return
         
-        hashed_password = init_admin_password()
-        
-        def try_login():
-            if verify_password(password.value, hashed_password):
-                session_id = create_session("admin")
+        async def try_login():
+            if await check_admin_password(password.value):
+                session_id = await create_session("admin")
                 ui.run_javascript(f'''
-                    document.cookie = "session_id={session_id}; path=/; max-age=3600; secure=false; samesite=lax";
+                    document.cookie = "session_id={session_id}; path=/; max-age={SESSION_TTL}; secure=false; samesite=lax";
                     window.location.href = "/";
                 ''')
             else:
@@ -93,16 +94,24 @@ def setup_ui(app: FastAPI):
     async def logout(request: Request):
         session_id = request.cookies.get("session_id")
         if session_id:
-            delete_session(session_id)
+            await delete_session(session_id)
         
         ui.run_javascript('''
             document.cookie = "session_id=; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT";
             window.location.href = "/login";
         ''')
     db_manager = DatabaseManager()
-    def database_switcher():
+
+    # Database each connected page works on, keyed by client id (seeded from its login session)
+    client_dbs: Dict[str, str] = {}
+
+    def client_db(client: Optional[Client] = None) -> str:
+        client = client or ui.context.client
+        return client_dbs.get(client.id, db_manager.current_db)
+
+    def database_switcher(session_id: str):
         options = db_manager.get_database_options()
-        with ui.select(options, value=db_manager.current_db) as select:
+        with ui.select(options, value=client_db()) as select:
             select.classes('w-64')
             
             def on_change():
@@ -119,81 +128,165 @@ def setup_ui(app: FastAPI):
                 async def switch_database():
                     try:
                         await ui.run_javascript('new Promise(resolve => setTimeout(resolve, 100))')  # Small delay for UI update
-                        db_manager.set_current_db(select.value)
-                        blacklist_table.refresh()
+                        if select.value not in db_manager.databases:
+                            raise ValueError(f"Invalid database key: {select.value}")
+                        # Stored on the login session, so API calls and other tabs follow
+                        await session_store.set_db(session_id, select.value)
+                        client_dbs[ui.context.client.id] = select.value
+                        await refresh_dashboard(select.value)
                         loading_dialog.close()
                         ui.notify(f"Switched to database: {db_manager.databases[select.value]['name']}", type='positive')
                     except Exception as e:
                         loading_dialog.close()
                         ui.notify(f"Error switching database: {e}", type='negative')
                         # Revert selection on error
-                        select.value = db_manager.current_db
+                        select.value = client_db()
                 
                 ui.timer(0.1, switch_database, once=True)
         
         select.on('update:model-value', on_change)
 
     @ui.refreshable
-    def blacklist_table():  
+    async def stats_cards():
         # Modern stats display
         try:
-            engine = db_manager.get_engine()
-            with Session(engine) as session:
-                stats = get_stats_blacklist(session=session)
+            async with db_manager.async_session(client_db()) as session:
+                stats = await get_stats_blacklist(session=session)
             
             with ui.row().classes('w-full gap-6 mb-8 justify-center'):
-                for i, (domain, count) in enumerate(stats.items()):
+                for i, (domain, counts) in enumerate(stats.items()):
                     with ui.card().classes('flex-1 min-w-[220px] max-w-[280px] glass card-shadow hover-lift border-0 status-card'):
                         with ui.column().classes('p-6 space-y-2'):
                             ui.label(domain).classes('text-sm font-semibold text-gray-700 uppercase tracking-wider')
-                            ui.label(f"{count:,}").classes('text-4xl font-bold text-orange-600')
+                            ui.label(f"{counts['blocked']:,}").classes('text-4xl font-bold text-orange-600')
                             ui.label('domains blocked').classes('text-xs text-gray-500 font-medium')
+                            ui.label(f"{counts['unblocked']:,} unblocked of {counts['total']:,}").classes('text-xs text-gray-400')
                             
         except Exception as e:
             ui.notify(f"Error loading stats: {e}", type='negative')
-        
-        # Modern domain table
-        try:
-            engine = db_manager.get_engine()
-            with Session(engine) as session:
-                query = select(Blacklist).order_by(Blacklist.id)
-                blacklist_entries = session.exec(query.limit(100)).all()
-                
-                # Table header with modern styling
-                with ui.card().classes('w-full glass card-shadow border-0 overflow-hidden'):
-                    with ui.column().classes('w-full'):
-                        # Header
-                        with ui.row().classes('w-full p-4 bg-gradient-to-r from-orange-500 to-red-500 text-white'):
-                            ui.label('ID').classes('w-16 font-semibold text-xs uppercase tracking-wider')
-                            ui.label('Original Domain').classes('flex-1 font-semibold text-xs uppercase tracking-wider')
-                            ui.label('Malicious Domain').classes('flex-1 font-semibold text-xs uppercase tracking-wider') 
-                            ui.label('Status').classes('w-24 text-center font-semibold text-xs uppercase tracking-wider')
-                            ui.label('Actions').classes('w-24 text-center font-semibold text-xs uppercase tracking-wider')
-                        
-                        # Data rows with alternating background
-                        for i, entry in enumerate(blacklist_entries):
-                            bg_class = 'bg-white' if i % 2 == 0 else 'bg-orange-50'
-                            with ui.row().classes(f'w-full p-4 border-b border-orange-100 {bg_class} items-center hover:bg-orange-100 transition-colors'):
-                                ui.label(str(entry.id)).classes('w-16 text-gray-600 font-mono text-sm')
-                                ui.label(entry.original).classes('flex-1 text-gray-800 font-medium text-sm')
-                                ui.label(entry.malicious).classes('flex-1 text-gray-800 font-mono text-sm')
-                                
-                                # Modern toggle switch
-                                with ui.element('div').classes('w-24 flex justify-center'):
-                                    switch = ui.switch(value=bool(entry.blocked)).props('color="orange" size="sm"')
-                                    switch.on('update:model-value', lambda e, entry_id=entry.id: toggle_blocked(entry_id, e.args[0] if e.args else False))
-                                
-                                # Modern delete button
-                                with ui.element('div').classes('w-24 flex justify-center'):
-                                    ui.button(icon='delete_outline', on_click=lambda entry_id=entry.id: delete_entry(entry_id)) \
-                                        .props('flat dense color="red-7" size="sm"') \
-                                        .classes('hover-lift')
 
-        except Exception as e:
-            ui.notify(f"Error loading data: {e}", type='negative')
-            with ui.card().classes('w-full p-8 text-center glass'):
-                ui.icon('error_outline', size='3rem').classes('text-red-400')
-                ui.label("Failed to load blacklist data").classes('text-red-600 font-semibold')
+    # Reloaders for the table on each connected page, keyed by client id
+    open_tables: Dict[str, Callable] = {}
+
+    async def blacklist_table():
+        # Server-side paginated table: sorting, filtering and search run in SQL, one page at a time
+        client = ui.context.client
+        columns = [
+            {'name': 'id', 'label': 'ID', 'field': 'id', 'sortable': True, 'align': 'left'},
+            {'name': 'original', 'label': 'Original Domain', 'field': 'original', 'sortable': True, 'align': 'left'},
+            {'name': 'malicious', 'label': 'Malicious Domain', 'field': 'malicious', 'sortable': True, 'align': 'left'},
+            {'name': 'blocked', 'label': 'Status', 'field': 'blocked', 'align': 'center'},
+            {'name': 'actions', 'label': 'Actions', 'field': 'id', 'align': 'center'},
+        ]
+        status_options = {'all': 'All', 'blocked': 'Blocked', 'unblocked': 'Unblocked'}
+
+        with ui.row().classes('w-full items-center gap-4'):
+            search = ui.input(placeholder='Search malicious domains') \
+                .classes('flex-1') \
+                .props('outlined dense clearable debounce="300" bg-color="white" color="orange-7"')
+            with search.add_slot('prepend'):
+                ui.icon('search')
+            status = ui.select(status_options, value='all').classes('w-40').props('outlined dense')
+            original = ui.select({'': 'All brands'}, value='').classes('w-56').props('outlined dense')
+            total_label = ui.label().classes('text-sm text-gray-500')
+
+        table = ui.table(
+            columns=columns,
+            rows=[],
+            row_key='id',
+            pagination={'page': 1, 'rowsPerPage': UI_PAGE_SIZE, 'sortBy': 'id', 'descending': False, 'rowsNumber': 0},
+        ).classes('w-full glass card-shadow border-0').props('flat binary-state-sort :rows-per-page-options="[25, 50, 100, 200]"')
+        table.add_slot('body-cell-malicious', '''
+            <q-td :props="props"><span class="mono">{{ props.value }}</span></q-td>
+        ''')
+        table.add_slot('body-cell-blocked', '''
+            <q-td :props="props">
+                <q-toggle :model-value="props.row.blocked === 1" color="orange" size="sm"
+                    @update:model-value="value => $parent.$emit('toggle', {id: props.row.id, blocked: value})" />
+            </q-td>
+        ''')
+        table.add_slot('body-cell-actions', '''
+            <q-td :props="props">
+                <q-btn flat dense color="red-7" size="sm" icon="delete_outline"
+                    @click="() => $parent.$emit('delete', props.row.id)" />
+            </q-td>
+        ''')
+
+        async def load(pagination: Optional[dict] = None):
+            pagination = {**table.pagination, **(pagination or {})}
+            blocked = {'all': None, 'blocked': 1, 'unblocked': 0}[status.value]
+            try:
+                async with db_manager.async_session(client_db(client)) as session:
+                    page = await get_blacklist_page(
+                        session=session,
+                        offset=(pagination['page'] - 1) * pagination['rowsPerPage'],
+                        limit=pagination['rowsPerPage'],
+                        sort=pagination.get('sortBy') or 'id',
+                        descending=bool(pagination.get('descending')),
+                        search=search.value or None,
+                        blocked=blocked,
+                        original=original.value or None,
+                    )
+                    if len(original.options) == 1:
+                        brands = await get_stats_blacklist(session=session)
+                        original.options = {'': 'All brands', **{brand: brand for brand in brands}}
+                        original.update()
+            except Exception as e:
+                ui.notify(f"Error loading data: {e}", type='negative')
+                return
+            pagination['rowsNumber'] = page['total']
+            table.rows = [row.model_dump() for row in page['rows']]
+            table.pagination = pagination
+            total_label.text = f"{page['total']:,}{'' if page['exact'] else '+'} entries"
+
+        async def toggle(e):
+            if not await toggle_blocked(e.args['id'], e.args['blocked']):
+                return
+            # Update the row in place instead of reloading the page
+            for row in table.rows:
+                if row['id'] == e.args['id']:
+                    row['blocked'] = int(e.args['blocked'])
+            table.update()
+
+        async def deleted(entry_id: int):
+            table.rows = [row for row in table.rows if row['id'] != entry_id]
+            table.pagination = {**table.pagination, 'rowsNumber': max(0, table.pagination.get('rowsNumber', 1) - 1)}
+
+        table.on('request', lambda e: load(e.args['pagination']))
+        table.on('toggle', toggle)
+        table.on('delete', lambda e: delete_entry(e.args, on_deleted=deleted))
+        for control in (search, status, original):
+            control.on_value_change(lambda: load({'page': 1}))
+
+        open_tables[client.id] = load
+        await load()
+
+    async def refresh_dashboard(db_key: Optional[str] = None):
+        """Re-renders the stats cards and reloads open tables (only those showing `db_key`, if given)."""
+        # Forget pages whose client has gone
+        for client_id in (set(open_tables) | set(client_dbs)) - set(Client.instances):
+            open_tables.pop(client_id, None)
+            client_dbs.pop(client_id, None)
+        stats_cards.refresh()
+        for client_id, load in list(open_tables.items()):
+            if db_key is None or client_dbs.get(client_id, db_manager.current_db) == db_key:
+                await load()
+
+    async def refresh_on_changes(db_key: str):
+        # Reload open tables in place when anyone (API, worker, import) changes this database
+        subscription = broker_for(db_key).subscribe()
+        while True:
+            if await subscription.wait(CHANGES_KEEPALIVE):
+                try:
+                    await refresh_dashboard(db_key)
+                except Exception as e:
+                    print(f"Dashboard refresh failed: {e}")
+                await asyncio.sleep(UI_REFRESH_INTERVAL)
+
+    nicegui_app.on_startup(lambda: [
+        background_tasks.create(refresh_on_changes(db_key), name=f'refresh_on_changes_{db_key}')
+        for db_key in db_manager.databases
+    ])
 
     def show_add_dialog():
         with ui.dialog() as dialog:
@@ -225,24 +318,26 @@ def setup_ui(app: FastAPI):
             
         dialog.open()
 
-    def toggle_blocked(entry_id: int, state: bool):
+    async def toggle_blocked(entry_id: int, state: bool) -> bool:
         try:
-            engine = db_manager.get_engine()
-            with Session(engine) as session:
-                update_blacklist(session=session, entry_id=entry_id, update_data=BlacklistUpdate(blocked=int(state)))
+            async with db_manager.async_session(client_db()) as session:
+                await update_blacklist(session=session, entry_id=entry_id, update_data=BlacklistUpdate(blocked=int(state)))
             ui.notify(f"Status updated for domain #{entry_id}", type='positive')
-            blacklist_table.refresh()
+            stats_cards.refresh()
+            return True
         except Exception as e:
             ui.notify(f"Error updating status: {e}", type='negative')
+            return False
 
-    def delete_entry(entry_id: int):
-        def handle_delete():
+    def delete_entry(entry_id: int, on_deleted: Optional[Callable] = None):
+        async def handle_delete():
             try:
-                engine = db_manager.get_engine()
-                with Session(engine) as session:
-                    delete_blacklist(session=session, entry_id=entry_id)
+                async with db_manager.async_session(client_db()) as session:
+                    await delete_blacklist(session=session, entry_id=entry_id)
                 ui.notify(f"Domain #{entry_id} deleted successfully", type='positive')
-                blacklist_table.refresh()
+                stats_cards.refresh()
+                if on_deleted is not None:
+                    await on_deleted(entry_id)
                 dialog.close()
             except Exception as e:
                 ui.notify(f"Error deleting entry: {e}", type='negative')
@@ -262,14 +357,13 @@ def setup_ui(app: FastAPI):
         
         dialog.open()
 
-    def add_entry(original: str, malicious: str, dialog: ui.dialog):
+    async def add_entry(original: str, malicious: str, dialog: ui.dialog):
         if not malicious:
             ui.notify("Malicious domain is required", type='negative')
             return
         try:
-            engine = db_manager.get_engine()
-            with Session(engine) as session:
-                create_blacklist(session=session, blacklist=Blacklist(
+            async with db_manager.async_session(client_db()) as session:
+                await create_blacklist(session=session, blacklist=Blacklist(
                     original=original or 'Manually Entered',
                     malicious=malicious,
                     blocked=1
@@ -277,19 +371,22 @@ def setup_ui(app: FastAPI):
             
             ui.notify("Domain added successfully!", type='positive')
             dialog.close()
-            blacklist_table.refresh()
+            await refresh_dashboard()
         except Exception as e:
             ui.notify(f"Error adding domain: {e}", type='negative')
 
     @ui.page('/')
     async def index(request: Request):
+        session = await get_login_session(request)
+        if session is not None and session.db_key in db_manager.databases:
+            client_dbs[ui.context.client.id] = session.db_key
         with ui.element('div').classes('gradient-bg min-h-screen flex justify-center p-4'):
             with ui.column().classes("page-container space-y-8 items-center"):
                 # Modern header
                 with ui.row().classes('w-full items-center justify-between mb-8'):
                     with ui.row().classes('items-center gap-4'):
                             ui.icon('database').classes('text-blue-500')
-                            database_switcher()
+                            database_switcher(request.cookies.get("session_id"))
                     with ui.column():
                         ui.label("Domain Security Center").classes("text-4xl font-bold text-gradient")
                         ui.label("Advanced malicious domain detection & blacklisting").classes("text-lg text-gray-600 font-medium")
@@ -318,24 +415,41 @@ def setup_ui(app: FastAPI):
                                     ui.notify("Please enter a domain", type='warning')
                                     return
                                 
-                                with ui.card().classes('bg-blue-50 border border-blue-200 p-4'):
+                                try:
+                                    async with db_manager.async_session(client_db()) as session:
+                                        queued = await blacklist_queue(session=session, valid_domain=ValidDomain(domain=domain))
+                                except Exception as e:
+                                    ui.notify(f"Error processing domain: {e}", type='negative')
+                                    return
+                                job_id = queued["job_id"]
+
+                                with ui.card().classes('bg-blue-50 border border-blue-200 p-4') as status_card:
                                     with ui.row().classes('items-center space-x-2'):
                                         ui.spinner(size='sm', color='blue')
-                                        ui.label("Analyzing domain... This may take several minutes").classes('text-blue-700 font-medium')
-                    
-                                def background_work():
+                                        status_label = ui.label(f"Analysis queued as job #{job_id}... This may take several minutes").classes('text-blue-700 font-medium')
+
+                                async def poll_job():
                                     try:
-                                        engine = db_manager.get_engine()
-                                        with Session(engine) as session:
-                                            worker(session, ValidDomain(domain=domain))
-                                        ui.notify("Analysis complete! Results added to blacklist", type='positive')
+                                        async with db_manager.async_session(client_db()) as session:
+                                            job = await get_job(session=session, job_id=job_id)
                                     except Exception as e:
                                         ui.notify(f"Error processing domain: {e}", type='negative')
-                                    finally:
-                                        ui.timer(0.1, lambda: blacklist_table.refresh(), once=True)
-                                
-                                thread = threading.Thread(target=background_work, daemon=True)
-                                thread.start()
+                                        timer.cancel()
+                                        return
+                                    if job.status in ('pending', 'running'):
+                                        status_label.text = f"Job #{job_id} {job.status}: {job.position:,} candidates checked, {job.hits:,} found"
+                                        return
+                                    timer.cancel()
+                                    status_card.delete()
+                                    if job.status == 'done':
+                                        ui.notify("Analysis complete! Results added to blacklist", type='positive')
+                                    elif job.status == 'failed':
+                                        ui.notify(f"Error processing domain: {job.error}", type='negative')
+                                    else:
+                                        ui.notify(f"Analysis job #{job_id} {job.status}", type='warning')
+                                    await refresh_dashboard()
+
+                                timer = ui.timer(5.0, poll_job)
                             
                             ui.button("Start Analysis", icon="analytics", on_click=submit_original) \
                                 .classes("w-full py-3 text-white font-semibold btn-success rounded-lg hover-lift")
@@ -359,16 +473,15 @@ def setup_ui(app: FastAPI):
                                     ui.notify("Please enter a domain", type='warning')
                                     return
                                 try:
-                                    engine = db_manager.get_engine()
-                                    with Session(engine) as session:
-                                        create_blacklist(session=session, blacklist=Blacklist(
+                                    async with db_manager.async_session(client_db()) as session:
+                                        await create_blacklist(session=session, blacklist=Blacklist(
                                             original="Manual Entry",
                                             malicious=domain,
                                             blocked=1
                                         ))
                                     ui.notify("Domain blacklisted successfully!", type='positive')
                                     malicious_input.value = ""
-                                    blacklist_table.refresh()
+                                    await refresh_dashboard()
                                 except Exception as e:
                                     ui.notify(f"Error adding domain: {e}", type='negative')
                             
@@ -386,7 +499,8 @@ def setup_ui(app: FastAPI):
                             ui.button("Add Domain", icon='add_circle', on_click=show_add_dialog) \
                                 .classes('px-6 py-3 text-white font-semibold btn-secondary rounded-lg hover-lift')
                         
-                        blacklist_table()
+                        await stats_cards()
+                        await blacklist_table()
 
     # Configure NiceGUI with modern settings
     ui.run_with(
@@ -0,0 +1,144 @@
+import asyncio
+from typing import Iterable, List, Optional, Set
+from sqlmodel import select
+from .config import UNBOUND_SYNC_BATCH, UNBOUND_SYNC_CHECK_INTERVAL, RPZ_JOURNAL_BATCH, EXPORT_FETCH_SIZE
+from .database import Blacklist, db_manager
+from .journal import journal_position, read_journal, blocked_among, compacted_past
+from .notify import broker_for
+from .codec import WILDCARD_PREFIX
+from .rpz import configured_targets, render_owner, resolver_db_key
+from .unbound_control import UnboundControl
+from .utils import chunked
+
+# Unbound puts local-data in a transparent zone of its own, which answers only that name
+# (these records, NODATA for other types) and resolves the names below it as usual - the
+# same set of names the RPZ "CNAME ." entry blocks
+UNBOUND_SINKHOLE = ("A 0.0.0.0", "AAAA ::")
+
+def exact_owners(owners: Iterable[str]) -> Set[str]:
+    return {owner for owner in owners if owner and not owner.startswith(WILDCARD_PREFIX)}
+
+# --- Live Zone Sync ---
+class UnboundZoneSync:
+    """
+    Pushes exact blocked names to a running Unbound as local-data (UNBOUND_SINKHOLE) over
+    the control socket, so they are live before the next RPZ build reaches it - no reload,
+    so the cache survives. Wildcard rules only come through the RPZ zone: a local-zone
+    always covers its apex too, so it cannot block just the names below it.
+
+    Resyncs in full at start, after a failed push and whenever Unbound's uptime goes
+    backwards (a restart drops pushed data). A resync only removes entries this tool
+    owns - ones it pushed or that are in Unbound's compiled RPZ zone - so data configured
+    in unbound.conf is left alone.
+    """
+
+    def __init__(self, control: Optional[UnboundControl] = None, db_key: Optional[str] = None):
+        self.control = control or UnboundControl()
+        self.db_key = db_key
+        self.seq: Optional[int] = None
+        self.uptime: Optional[int] = None
+        self.owned: Set[str] = set()
+        self.resyncs = 0
+        self.pushed = 0
+
+    def _engine(self):
+        return db_manager.get_engine(self.db_key or resolver_db_key())
+
+    def _push(self, adds: List[str], removes: List[str]):
+        """Applies exact owner names (as from render_owner) to Unbound."""
+        for batch in chunked(removes, UNBOUND_SYNC_BATCH):
+            self.control.command("local_datas_remove", [f"{owner}." for owner in batch])
+        for batch in chunked(adds, UNBOUND_SYNC_BATCH // len(UNBOUND_SINKHOLE)):
+            self.control.command("local_datas", [f"{owner}. {record}" for owner in batch for record in UNBOUND_SINKHOLE])
+        self.owned.difference_update(removes)
+        self.owned.update(adds)
+        self.pushed += len(adds) + len(removes)
+
+    def _current(self) -> Set[str]:
+        """Names Unbound answers with the sinkhole records."""
+        owners = set()
+        sinkhole = {tuple(record.split()) for record in UNBOUND_SINKHOLE}
+        for line in self.control.command("list_local_data").splitlines():
+            # "name. TTL IN TYPE DATA"
+            parts = line.split()
+            if len(parts) == 5 and (parts[3], parts[4]) in sinkhole:
+                owners.add(parts[0].rstrip('.').lower())
+        return owners
+
+    def _compiled(self) -> Set[str]:
+        """Exact names in the RPZ zone compiled for this Unbound."""
+        owners = set()
+        for target in configured_targets():
+            if target.control_socket == self.control.path and target.is_complete():
+                for shard in range(target.shards):
+                    owners |= exact_owners(target.read_shard(shard))
+        return owners
+
+    def resync(self):
+        with self._engine().connect() as conn:
+            seq = journal_position(conn)
+            result = conn.execution_options(stream_results=True, yield_per=EXPORT_FETCH_SIZE).execute(
+                select(Blacklist.malicious).where(Blacklist.blocked == 1)
+            )
+            desired = exact_owners(map(render_owner, result.scalars()))
+        current = self._current()
+        stale = (current - desired) & (self.owned | self._compiled())
+        self.owned = current & desired | self.owned & current
+        self._push(sorted(desired - current), sorted(stale))
+        self.seq = seq
+        self.resyncs += 1
+
+    def apply_changes(self):
+        with self._engine().connect() as conn:
+            if compacted_past(conn, self.seq):
+                self.seq = None
+                return
+            while True:
+                seq, names = read_journal(conn, self.seq, RPZ_JOURNAL_BATCH)
+                if not names:
+                    return
+                changed = exact_owners(map(render_owner, names))
+                blocked = exact_owners(map(render_owner, blocked_among(conn, names)))
+                self._push(sorted(changed & blocked), sorted(changed - blocked))
+                self.seq = seq
+
+    def run_once(self):
+        if not self.control.available:
+            self.seq = None
+            return
+        try:
+            uptime = self.control.uptime()
+            if self.seq is not None and self.uptime is not None and uptime >= self.uptime:
+                self.apply_changes()
+            if self.seq is None or self.uptime is None or uptime < self.uptime:
+                self.resync()
+            self.uptime = uptime
+        except Exception:
+            # State on the Unbound side is unknown now
+            self.seq = None
+            raise
+
+    async def follow(self):
+        broker = broker_for(self.db_key or resolver_db_key())
+        subscription = broker.subscribe()
+        try:
+            while True:
+                try:
+                    await asyncio.to_thread(self.run_once)
+                except Exception as e:
+                    print(f"Unbound zone sync failed: {e}")
+                await subscription.wait(UNBOUND_SYNC_CHECK_INTERVAL)
+        finally:
+            broker.unsubscribe(subscription)
+
+    def stats(self) -> dict:
+        return {
+            "available": self.control.available,
+            "seq": self.seq,
+            "uptime": self.uptime,
+            "resyncs": self.resyncs,
+            "pushed": self.pushed,
+            "owned": len(self.owned),
+        }
+
+unbound_sync = UnboundZoneSync()
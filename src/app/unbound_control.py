@@ -0,0 +1,42 @@
+import os
+import re
+import socket
+from typing import Iterable, Optional
+from .config import UNBOUND_CONTROL_SOCKET, PURGE_TIMEOUT
+
+# --- Remote Control ---
+class UnboundControl:
+    """
+    unbound-control over the unix control socket: one "UBCT1 <command>" per connection.
+    Bulk commands read their lines after the command, terminated by EOT (0x04).
+    """
+
+    def __init__(self, path: str = UNBOUND_CONTROL_SOCKET):
+        self.path = path
+
+    @property
+    def available(self) -> bool:
+        return os.path.exists(self.path)
+
+    def command(self, line: str, body: Optional[Iterable[str]] = None) -> str:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(PURGE_TIMEOUT)
+            sock.connect(self.path)
+            request = f"UBCT1 {line}\n"
+            if body is not None:
+                request += "".join(f"{entry}\n" for entry in body) + "\x04\n"
+            sock.sendall(request.encode())
+            chunks = []
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                chunks.append(chunk)
+        reply = b"".join(chunks).decode(errors="replace")
+        if reply.startswith("error"):
+            raise RuntimeError(f"unbound-control {line.split()[0]}: {reply.strip()}")
+        return reply
+
+    def uptime(self) -> int:
+        match = re.search(r"uptime: (\d+)", self.command("status"))
+        return int(match.group(1)) if match else 0
@@ -0,0 +1,11 @@
+from itertools import islice
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+# --- Iteration Helpers ---
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Successive lists of up to `size` items."""
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
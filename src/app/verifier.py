@@ -0,0 +1,91 @@
+import asyncio
+from typing import Callable, Iterable, List, Optional
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+from .config import GOOGLE_DNS_SERVER, QUAD9_DNS_SERVER, DNS_TIMEOUT, DNS_CONCURRENCY, DNS_CACHE_CHUNK
+from .dns_cache import ResolutionCache, resolution_cache, positive_ttl, negative_ttl
+from .utils import chunked
+
+# --- Async DNS Verification Engine ---
+def make_resolver(nameserver: str) -> dns.asyncresolver.Resolver:
+    resolver = dns.asyncresolver.Resolver(configure=False)
+    resolver.nameservers = [nameserver]
+    return resolver
+
+class DomainVerifier:
+    """
+    Checks lookalike candidates against Google DNS and then Quad9, keeping at most
+    `concurrency` lookups in flight. Resolvers are created once and reused.
+
+    Outcomes go through the resolution cache; when an engine is given, each chunk of
+    candidates is prefetched from and written back to the resolution_cache table.
+
+    Use `await verifier.verify(...)` from async code (API, NiceGUI handlers) or
+    `verifier.run(...)` from a plain thread.
+    """
+
+    def __init__(self, concurrency: int = DNS_CONCURRENCY, timeout: float = DNS_TIMEOUT,
+                 engine=None, cache: ResolutionCache = resolution_cache, chunk_size: int = DNS_CACHE_CHUNK):
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.engine = engine
+        self.cache = cache
+        self.chunk_size = chunk_size
+        self.resolvers = {
+            "google": make_resolver(GOOGLE_DNS_SERVER),
+            "quad9": make_resolver(QUAD9_DNS_SERVER),
+        }
+
+    async def resolves(self, stage: str, domain: str) -> bool:
+        cached = self.cache.get(stage, domain)
+        if cached is not None:
+            return cached
+        try:
+            answers = await self.resolvers[stage].resolve(domain, 'A', lifetime=self.timeout)
+            self.cache.put(stage, domain, True, positive_ttl(answers))
+            return True
+        except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+            self.cache.put(stage, domain, False, negative_ttl(e))
+            return False
+        except dns.exception.DNSException:
+            # Timeouts and server failures say nothing about the name, so aren't cached
+            return False
+        except Exception:
+            return False
+
+    async def check(self, domain: str) -> bool:
+        # Quad9 is only asked about domains Google already resolved
+        if not await self.resolves("google", domain):
+            return False
+        return await self.resolves("quad9", domain)
+
+    async def _verify_chunk(self, candidates: List[str], hits: List[str],
+                            on_hit: Optional[Callable[[str], None]]):
+        # Every consumer pulls the next candidate from the shared iterator,
+        # so at most `concurrency` lookups are pending.
+        iterator = iter(candidates)
+
+        async def consume():
+            for domain in iterator:
+                if await self.check(domain):
+                    hits.append(domain)
+                    if on_hit:
+                        on_hit(domain)
+
+        await asyncio.gather(*(consume() for _ in range(min(self.concurrency, len(candidates)))))
+
+    async def verify(self, candidates: Iterable[str],
+                     on_hit: Optional[Callable[[str], None]] = None) -> List[str]:
+        hits = []
+        for chunk in chunked(candidates, self.chunk_size):
+            if self.engine is not None:
+                await asyncio.to_thread(self.cache.prefetch, self.engine, chunk)
+            await self._verify_chunk(chunk, hits, on_hit)
+            if self.engine is not None:
+                await asyncio.to_thread(self.cache.flush, self.engine)
+        return hits
+
+    def run(self, candidates: Iterable[str],
+            on_hit: Optional[Callable[[str], None]] = None) -> List[str]:
+        return asyncio.run(self.verify(candidates, on_hit))